@@ -1,27 +1,80 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.dialects import registry
+from sqlalchemy.exc import NoSuchModuleError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import logging
 import os
 from typing import AsyncGenerator
 
+from sqlite_pragmas import set_sqlite_pragmas
+
+logger = logging.getLogger(__name__)
+
 # Create declarative base
 Base = declarative_base()
 
 # Database configuration (use SQLite for local development)
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./vat_system.db")
 
+# Optional SQLite async driver (SQLITE_DRIVER=cysqlite) - used only when an
+# asyncio SQLAlchemy dialect for it is installed as sqlite+<driver>; aiosqlite stays default
+SQLITE_DRIVER = os.getenv("SQLITE_DRIVER", "aiosqlite")
+
+def _select_sqlite_driver(url: str) -> str:
+    """Swap the aiosqlite driver for SQLITE_DRIVER when an async dialect for it is available"""
+    if SQLITE_DRIVER == "aiosqlite" or not url.startswith("sqlite+aiosqlite"):
+        return url
+    try:
+        dialect = registry.load(f"sqlite.{SQLITE_DRIVER}")
+    except NoSuchModuleError:
+        logger.warning("SQLite driver %s is not installed, using aiosqlite", SQLITE_DRIVER)
+        return url
+    if not dialect.is_async:
+        logger.warning("SQLite driver %s is not an asyncio driver, using aiosqlite", SQLITE_DRIVER)
+        return url
+    return url.replace("sqlite+aiosqlite", f"sqlite+{SQLITE_DRIVER}", 1)
+
+DATABASE_URL = _select_sqlite_driver(DATABASE_URL)
+
+# Connection pool settings - keep connections open between requests so
+# connection setup (file open / TCP handshake) is paid once per connection
+if DATABASE_URL.startswith("sqlite"):
+    # SQLite file databases: a small pool of long-lived aiosqlite connections
+    # keeps the page cache warm; pre-ping/recycle are not needed locally
+    pool_options = {
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_size": 5,
+        "max_overflow": 5,
+    }
+else:
+    pool_options = {
+        "pool_size": 20,
+        "max_overflow": 10,
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+    }
+
 # Create async engine
 engine = create_async_engine(
     DATABASE_URL,
-    echo=True,  # Set to False in production
-    future=True
+    echo=os.getenv("SQL_ECHO", "0") == "1",  # SQL_ECHO=1 to log statements
+    future=True,
+    query_cache_size=1200,  # compiled statement cache (default 500)
+    **pool_options
 )
 
-# Create async session factory
-AsyncSessionLocal = sessionmaker(
-    engine, 
-    class_=AsyncSession, 
-    expire_on_commit=False
+# SQLite tuning - WAL lets readers proceed while a write is in progress
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+
+# Create async session factory - no autoflush, handlers flush/commit explicitly
+AsyncSessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False
 )
 
 # Dependency for FastAPI
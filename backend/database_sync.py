@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 import os
 
+from sqlite_pragmas import set_sqlite_pragmas
+
 # Create declarative base
 Base = declarative_base()
 
@@ -12,10 +14,14 @@ DATABASE_URL = "sqlite:///./vat_system.db"
 # Create sync engine
 engine = create_engine(
     DATABASE_URL,
-    echo=True,  # Set to False in production
+    echo=os.getenv("SQL_ECHO", "0") == "1",  # SQL_ECHO=1 to log statements
+    query_cache_size=1200,
     connect_args={"check_same_thread": False}  # SQLite specific
 )
 
+# WAL journal + relaxed fsync so API reads are not blocked by inserts
+event.listen(engine, "connect", set_sqlite_pragmas)
+
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
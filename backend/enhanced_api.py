@@ -1,12 +1,23 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Query
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from contextlib import asynccontextmanager
+from pydantic import TypeAdapter
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, timezone
+import asyncio
+import hashlib
+import json
 import logging
+import os
+import re
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Enhanced imports
-from enhanced_database import get_enhanced_db, create_enhanced_tables, get_database_stats
+from enhanced_database import get_enhanced_db, get_enhanced_async_db, create_enhanced_tables, get_database_stats
 from enhanced_models import (
     EnhancedCompany, EnhancedPurchaseEntry, EnhancedSalesEntry,
     EnhancedVATDeclaration, VIESReport, DocumentTypeMapping, ExportLog,
@@ -29,18 +40,26 @@ from enhanced_services import (
 # VIES validation service (existing)
 from vies_validation_service import vies_validator
 
-# Logging setup
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create enhanced tables on startup
-create_enhanced_tables()
+# Maximum concurrent VIES requests from one batch validation call
+VIES_BATCH_CONCURRENCY = 8
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Configure logging once for the running app rather than on every import
+    logging.basicConfig(level=logging.INFO)
+    # Create enhanced tables once per application startup
+    create_enhanced_tables()
+    yield
 
 # FastAPI app initialization
 app = FastAPI(
     title="Enhanced Bulgarian VAT Management System",
     description="Complete VAT compliance system with all NRA document types - Enhanced version",
-    version="3.0.0"
+    version="3.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -52,6 +71,124 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (XML/JSON exports, long ledgers)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+# ============================================================================
+# SHARED DEPENDENCIES
+# ============================================================================
+
+async def resolve_company(uic: str, db: AsyncSession = Depends(get_enhanced_async_db)) -> EnhancedCompany:
+    """Resolve the {uic} path parameter to a company (cached by FastAPI per request)"""
+    result = await db.execute(select(EnhancedCompany).where(EnhancedCompany.uic == uic))
+    company = result.scalars().first()
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    return company
+
+_PERIOD_RE = re.compile(r"^(?P<y>\d{4})(?P<m>0[1-9]|1[0-2])$")
+
+def valid_period(period: str) -> str:
+    """Reject a malformed {period} path parameter (YYYYMM) before touching the DB"""
+    if not _PERIOD_RE.fullmatch(period):
+        raise HTTPException(status_code=400, detail="Invalid period, expected YYYYMM")
+    return period
+
+# ============================================================================
+# REFERENCE DATA (static, built once at import)
+# ============================================================================
+
+_PURCHASE_DESC = {
+    1: "Standard invoice for purchases",
+    2: "Customs import document", 
+    3: "Credit note/protocol document",
+    5: "Documents per Article 15a (since 01.04.2020)",
+    7: "Aggregate invoices",
+    9: "Documents without tax credit rights",
+    11: "Triangular operations per Article 15",
+    12: "Triangular operations per Article 14", 
+    13: "Acquisitions per Article 14",
+    23: "Documents per Article 126a",
+    91: "VAT application per Article 151a, par. 1",
+    92: "VAT application per Article 151a, par. 2",
+    93: "VAT application per Article 151a, par. 3",
+    94: "VAT application per Article 151a, par. 4"
+}
+
+_SALES_DESC = {
+    1: "Domestic sales invoice",
+    2: "EU sales (intra-community delivery)",
+    3: "Export sales (outside EU)",
+    4: "Triangular sales operations",
+    5: "Distance selling",
+    6: "Intra-community acquisitions"
+}
+
+_FIELD_DEFS = {
+    "field_09": "Deliveries/services taxable at 20%",
+    "field_10": "VAT amount for field 09",
+    "field_11": "Deliveries/services taxable at 0%", 
+    "field_12": "Exempt deliveries/services",
+    "field_13": "Intra-community deliveries",
+    "field_14": "Exports",
+    "field_15": "Other deliveries outside Bulgaria",
+    "field_16": "Distance sales to Bulgaria",
+    "field_17": "VAT for distance sales",
+    "field_18": "Intra-community acquisitions",
+    "field_19": "VAT for intra-community acquisitions",
+    "field_20": "Other acquisitions subject to reverse charge",
+    "field_21": "VAT for other acquisitions",
+    "field_22": "Import VAT",
+    "field_23": "Corrections of previous periods",
+    "field_24": "VAT corrections", 
+    "field_25": "Other corrections",
+    "field_50": "Total sales VAT due",
+    "field_60": "Total purchase VAT deductible",
+    "field_70": "VAT due to budget",
+    "field_71": "VAT refund due from budget",
+    "field_80": "Refund amount",
+    "field_81": "Amount to pay",
+    "field_82": "Amount to refund"
+}
+
+# Response payloads for the reference endpoints - the enums never change at
+# runtime, so the same objects are returned on every request
+_PURCHASE_DT_RESPONSE = {
+    "document_types": [
+        {"code": dt.value, "name": dt.name, "description": _PURCHASE_DESC.get(dt.value, "Unknown document type")}
+        for dt in PurchaseDocumentType
+    ]
+}
+
+_SALES_DT_RESPONSE = {
+    "document_types": [
+        {"code": dt.value, "name": dt.name, "description": _SALES_DESC.get(dt.value, "Unknown document type")}
+        for dt in SalesDocumentType
+    ]
+}
+
+_FIELD_DEFS_RESPONSE = {
+    "field_definitions": _FIELD_DEFS
+}
+
+# HTTP caching for reference endpoints: body bytes and ETag are computed
+# once, so repeat requests are answered with 304 without re-serializing
+_REFERENCE_CACHE_CONTROL = "public, max-age=3600"
+
+def _encode_reference_payload(payload: Dict[str, Any]) -> tuple:
+    """Serialize a reference payload and derive its ETag"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, f'"{hashlib.sha1(body).hexdigest()}"'
+
+_PURCHASE_DT_BODY, _PURCHASE_DT_ETAG = _encode_reference_payload(_PURCHASE_DT_RESPONSE)
+_SALES_DT_BODY, _SALES_DT_ETAG = _encode_reference_payload(_SALES_DT_RESPONSE)
+_FIELD_DEFS_BODY, _FIELD_DEFS_ETAG = _encode_reference_payload(_FIELD_DEFS_RESPONSE)
+
+# List serializers - validate ORM rows and dump straight to JSON bytes
+_DOCUMENT_TYPE_LIST_TA = TypeAdapter(List[DocumentTypeMappingResponse])
+_PURCHASE_LIST_TA = TypeAdapter(List[EnhancedPurchaseEntryResponse])
+_SALES_LIST_TA = TypeAdapter(List[EnhancedSalesEntryResponse])
+
 # ============================================================================
 # ENHANCED COMPANY MANAGEMENT
 # ============================================================================
@@ -66,12 +203,8 @@ def create_enhanced_company(company: EnhancedCompanyCreate, db=Depends(get_enhan
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/v2/companies/{uic}", response_model=EnhancedCompanyResponse)
-def get_enhanced_company(uic: str, db=Depends(get_enhanced_db)):
+async def get_enhanced_company(company: EnhancedCompany = Depends(resolve_company)):
     """Get enhanced company by UIC"""
-    service = EnhancedCompanyService(db)
-    company = service.get_company(uic)
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
     return company
 
 @app.get("/api/v2/companies", response_model=List[EnhancedCompanyResponse])
@@ -97,22 +230,36 @@ def create_enhanced_purchase_entry(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/v2/companies/{uic}/purchases:bulk", response_model=List[EnhancedPurchaseEntryResponse])
+def create_enhanced_purchases_bulk(
+    uic: str,
+    entries: List[EnhancedPurchaseEntryCreate],
+    db=Depends(get_enhanced_db)
+):
+    """Create many purchase entries in one request and one transaction"""
+    try:
+        service = EnhancedPurchaseService(db)
+        return service.create_many(uic, entries)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/v2/companies/{uic}/purchases/{period}", response_model=List[EnhancedPurchaseEntryResponse])
 def get_enhanced_purchases(
     uic: str, 
-    period: str, 
+    period: str = Depends(valid_period),
     document_type: Optional[int] = Query(None, description="Filter by document type"),
     db=Depends(get_enhanced_db)
 ):
     """Get purchase entries with optional document type filter"""
     try:
         service = EnhancedPurchaseService(db)
-        return service.get_purchases(uic, period, document_type)
+        rows = service.get_purchases(uic, period, document_type)
+        return _json_list_response(_PURCHASE_LIST_TA, rows)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/v2/companies/{uic}/purchases/{period}/summary")
-def get_purchase_summary_by_type(uic: str, period: str, db=Depends(get_enhanced_db)):
+def get_purchase_summary_by_type(uic: str, period: str = Depends(valid_period), db=Depends(get_enhanced_db)):
     """Get purchase summary grouped by document type"""
     try:
         service = EnhancedPurchaseService(db)
@@ -121,14 +268,9 @@ def get_purchase_summary_by_type(uic: str, period: str, db=Depends(get_enhanced_
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/v2/purchase-document-types")
-def get_purchase_document_types():
+def get_purchase_document_types(request: Request):
     """Get all supported purchase document types"""
-    return {
-        "document_types": [
-            {"code": doc_type.value, "name": doc_type.name, "description": _get_document_description(doc_type.value)}
-            for doc_type in PurchaseDocumentType
-        ]
-    }
+    return _etag_response(request, _PURCHASE_DT_BODY, _PURCHASE_DT_ETAG)
 
 # ============================================================================
 # ENHANCED SALES LEDGER (Field Mapping System)
@@ -147,22 +289,36 @@ def create_enhanced_sales_entry(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@app.post("/api/v2/companies/{uic}/sales:bulk", response_model=List[EnhancedSalesEntryResponse])
+def create_enhanced_sales_bulk(
+    uic: str,
+    entries: List[EnhancedSalesEntryCreate],
+    db=Depends(get_enhanced_db)
+):
+    """Create many sales entries in one request and one transaction"""
+    try:
+        service = EnhancedSalesService(db)
+        return service.create_many(uic, entries)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/v2/companies/{uic}/sales/{period}", response_model=List[EnhancedSalesEntryResponse])
 def get_enhanced_sales(
     uic: str, 
-    period: str, 
+    period: str = Depends(valid_period),
     document_type: Optional[int] = Query(None, description="Filter by document type"),
     db=Depends(get_enhanced_db)
 ):
     """Get sales entries with optional document type filter"""
     try:
         service = EnhancedSalesService(db)
-        return service.get_sales(uic, period, document_type)
+        rows = service.get_sales(uic, period, document_type)
+        return _json_list_response(_SALES_LIST_TA, rows)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/v2/companies/{uic}/sales/{period}/field-totals")
-def get_sales_field_totals(uic: str, period: str, db=Depends(get_enhanced_db)):
+def get_sales_field_totals(uic: str, period: str = Depends(valid_period), db=Depends(get_enhanced_db)):
     """Calculate totals for all declaration fields (9-25)"""
     try:
         service = EnhancedSalesService(db)
@@ -171,21 +327,16 @@ def get_sales_field_totals(uic: str, period: str, db=Depends(get_enhanced_db)):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/v2/sales-document-types")
-def get_sales_document_types():
+def get_sales_document_types(request: Request):
     """Get all supported sales document types"""
-    return {
-        "document_types": [
-            {"code": doc_type.value, "name": doc_type.name, "description": _get_sales_document_description(doc_type.value)}
-            for doc_type in SalesDocumentType
-        ]
-    }
+    return _etag_response(request, _SALES_DT_BODY, _SALES_DT_ETAG)
 
 # ============================================================================
 # ENHANCED VAT DECLARATIONS (Fields 1-82)
 # ============================================================================
 
 @app.post("/api/v2/companies/{uic}/declarations/{period}")
-def generate_enhanced_declaration(uic: str, period: str, db=Depends(get_enhanced_db)):
+def generate_enhanced_declaration(uic: str, period: str = Depends(valid_period), db=Depends(get_enhanced_db)):
     """Generate enhanced VAT declaration with automatic field calculations"""
     try:
         service = EnhancedVATDeclarationService(db)
@@ -198,17 +349,17 @@ def generate_enhanced_declaration(uic: str, period: str, db=Depends(get_enhanced
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/v2/companies/{uic}/declarations/{period}", response_model=EnhancedVATDeclarationResponse)
-def get_enhanced_declaration(uic: str, period: str, db=Depends(get_enhanced_db)):
+async def get_enhanced_declaration(
+    period: str = Depends(valid_period),
+    company: EnhancedCompany = Depends(resolve_company),
+    db: AsyncSession = Depends(get_enhanced_async_db)
+):
     """Get enhanced VAT declaration"""
-    service = EnhancedCompanyService(db)
-    company = service.get_company(uic)
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
-        
-    declaration = db.query(EnhancedVATDeclaration).filter(
+    stmt = select(EnhancedVATDeclaration).where(
         EnhancedVATDeclaration.company_id == company.id,
         EnhancedVATDeclaration.period == period
-    ).first()
+    )
+    declaration = (await db.execute(stmt)).scalars().first()
     
     if not declaration:
         raise HTTPException(status_code=404, detail="Declaration not found")
@@ -229,18 +380,16 @@ def validate_enhanced_declaration(declaration_id: int, db=Depends(get_enhanced_d
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/v2/vat-field-definitions")
-def get_vat_field_definitions():
+def get_vat_field_definitions(request: Request):
     """Get definitions for all VAT declaration fields (9-82)"""
-    return {
-        "field_definitions": _get_field_definitions()
-    }
+    return _etag_response(request, _FIELD_DEFS_BODY, _FIELD_DEFS_ETAG)
 
 # ============================================================================
 # VIES REPORTING INTEGRATION
 # ============================================================================
 
 @app.post("/api/v2/companies/{uic}/vies-reports/{period}", response_model=VIESReportResponse)
-def generate_vies_report(uic: str, period: str, db=Depends(get_enhanced_db)):
+def generate_vies_report(uic: str, period: str = Depends(valid_period), db=Depends(get_enhanced_db)):
     """Generate VIES report for EU transactions"""
     try:
         service = EnhancedVIESService(db)
@@ -249,17 +398,17 @@ def generate_vies_report(uic: str, period: str, db=Depends(get_enhanced_db)):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/v2/companies/{uic}/vies-reports/{period}", response_model=VIESReportResponse)
-def get_vies_report(uic: str, period: str, db=Depends(get_enhanced_db)):
+async def get_vies_report(
+    period: str = Depends(valid_period),
+    company: EnhancedCompany = Depends(resolve_company),
+    db: AsyncSession = Depends(get_enhanced_async_db)
+):
     """Get existing VIES report"""
-    service = EnhancedCompanyService(db)
-    company = service.get_company(uic)
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
-        
-    report = db.query(VIESReport).filter(
+    stmt = select(VIESReport).where(
         VIESReport.company_id == company.id,
         VIESReport.period == period
-    ).first()
+    )
+    report = (await db.execute(stmt)).scalars().first()
     
     if not report:
         raise HTTPException(status_code=404, detail="VIES report not found")
@@ -297,28 +446,34 @@ def export_declaration_to_nap(
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/v2/exports/{export_id}", response_model=ExportLogResponse)
-def get_export_status(export_id: int, db=Depends(get_enhanced_db)):
+async def get_export_status(export_id: int, db: AsyncSession = Depends(get_enhanced_async_db)):
     """Get export status and details"""
-    export_log = db.query(ExportLog).filter(ExportLog.id == export_id).first()
+    export_log = await db.get(ExportLog, export_id)
     if not export_log:
         raise HTTPException(status_code=404, detail="Export not found")
     return export_log
 
 @app.get("/api/v2/exports/{export_id}/download")
-def download_export_file(export_id: int, db=Depends(get_enhanced_db)):
+async def download_export_file(export_id: int, db: AsyncSession = Depends(get_enhanced_async_db)):
     """Download exported file"""
-    export_log = db.query(ExportLog).filter(ExportLog.id == export_id).first()
+    export_log = await db.get(ExportLog, export_id)
     if not export_log:
         raise HTTPException(status_code=404, detail="Export not found")
         
     if export_log.export_status != "SUCCESS" or not export_log.file_path:
         raise HTTPException(status_code=400, detail="Export file not available")
         
-    # Return file (implementation depends on file storage)
+    try:
+        file_stat = os.stat(export_log.file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Export file not found on disk")
+        
+    # Pass the stat result so Starlette does not stat the file again
     return FileResponse(
         path=export_log.file_path,
         filename=export_log.file_name,
-        media_type='application/xml' if export_log.export_format == 'XML' else 'application/json'
+        media_type='application/xml' if export_log.export_format == 'XML' else 'application/json',
+        stat_result=file_stat
     )
 
 # ============================================================================
@@ -326,56 +481,92 @@ def download_export_file(export_id: int, db=Depends(get_enhanced_db)):
 # ============================================================================
 
 @app.get("/api/v2/document-types", response_model=List[DocumentTypeMappingResponse])
-def get_document_type_mappings(
+async def get_document_type_mappings(
+    request: Request,
     category: Optional[str] = Query(None, pattern="^(PURCHASE|SALES)$"),
     active_only: bool = Query(True),
-    db=Depends(get_enhanced_db)
+    db: AsyncSession = Depends(get_enhanced_async_db)
 ):
     """Get document type mappings and validation rules"""
-    query = db.query(DocumentTypeMapping)
+    stmt = select(DocumentTypeMapping)
     
     if category:
-        query = query.filter(DocumentTypeMapping.document_category == category)
+        stmt = stmt.where(DocumentTypeMapping.document_category == category)
     if active_only:
-        query = query.filter(DocumentTypeMapping.is_active == True)
+        stmt = stmt.where(DocumentTypeMapping.is_active == True)
         
-    return query.all()
+    mappings = (await db.execute(stmt)).scalars().all()
+    
+    # Mappings live in the database, so the ETag is derived from the current rows
+    body = _dump_json_list(_DOCUMENT_TYPE_LIST_TA, mappings)
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    return _etag_response(request, body, etag)
 
 # ============================================================================
 # TRIANGULAR OPERATIONS SUPPORT
 # ============================================================================
 
 @app.get("/api/v2/companies/{uic}/triangular-operations/{period}")
-def get_triangular_operations(uic: str, period: str, db=Depends(get_enhanced_db)):
-    """Get all triangular operations for a period"""
-    service = EnhancedCompanyService(db)
-    company = service.get_company(uic)
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
-    
-    # Get triangular purchase operations
-    triangular_purchases = db.query(EnhancedPurchaseEntry).filter(
+async def get_triangular_operations(
+    period: str = Depends(valid_period),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum rows returned per ledger"),
+    offset: int = Query(0, ge=0),
+    company: EnhancedCompany = Depends(resolve_company),
+    db: AsyncSession = Depends(get_enhanced_async_db)
+):
+    """Get triangular operations for a period (summary over all rows, entries paginated)"""
+    purchase_filter = (
         EnhancedPurchaseEntry.company_id == company.id,
         EnhancedPurchaseEntry.period == period,
         EnhancedPurchaseEntry.document_type.in_([11, 12, 13])  # Triangular types
-    ).all()
-    
-    # Get triangular sales operations  
-    triangular_sales = db.query(EnhancedSalesEntry).filter(
+    )
+    sales_filter = (
         EnhancedSalesEntry.company_id == company.id,
         EnhancedSalesEntry.period == period,
         EnhancedSalesEntry.document_type == SalesDocumentType.TRIANGULAR_SALES.value
-    ).all()
+    )
+    
+    # Aggregate in SQL so the summary does not depend on the page size
+    purchase_count, purchase_total = (await db.execute(
+        select(
+            func.count(EnhancedPurchaseEntry.id),
+            func.coalesce(func.sum(EnhancedPurchaseEntry.total_amount), 0)
+        ).where(*purchase_filter)
+    )).one()
+    sales_count, sales_total = (await db.execute(
+        select(
+            func.count(EnhancedSalesEntry.id),
+            func.coalesce(func.sum(EnhancedSalesEntry.total_amount), 0)
+        ).where(*sales_filter)
+    )).one()
+    
+    # Get triangular purchase operations (current page)
+    purchases_stmt = (
+        select(EnhancedPurchaseEntry).where(*purchase_filter)
+        .order_by(EnhancedPurchaseEntry.id).limit(limit).offset(offset)
+    )
+    triangular_purchases = (await db.execute(purchases_stmt)).scalars().all()
+    
+    # Get triangular sales operations (current page)
+    sales_stmt = (
+        select(EnhancedSalesEntry).where(*sales_filter)
+        .order_by(EnhancedSalesEntry.id).limit(limit).offset(offset)
+    )
+    triangular_sales = (await db.execute(sales_stmt)).scalars().all()
     
     return {
         "period": period,
         "triangular_purchases": triangular_purchases,
         "triangular_sales": triangular_sales,
         "summary": {
-            "purchase_count": len(triangular_purchases),
-            "sales_count": len(triangular_sales),
-            "total_purchase_amount": sum(p.total_amount or 0 for p in triangular_purchases),
-            "total_sales_amount": sum(s.total_amount or 0 for s in triangular_sales)
+            "purchase_count": purchase_count,
+            "sales_count": sales_count,
+            "total_purchase_amount": purchase_total,
+            "total_sales_amount": sales_total
+        },
+        "pagination": {
+            "limit": limit,
+            "offset": offset
         }
     }
 
@@ -387,33 +578,35 @@ def get_triangular_operations(uic: str, period: str, db=Depends(get_enhanced_db)
 def validate_eu_vat_number_v2(request: Dict):
     """Enhanced EU VAT validation with logging"""
     try:
-        result = vies_validator.validate_vat_number(
-            country_code=request.get("country_code"),
-            vat_number=request.get("vat_number"),
-            requester_country_code=request.get("requester_country_code", "BG"),
-            requester_vat=request.get("requester_vat"),
-            trader_name=request.get("trader_name"),
-            trader_address=request.get("trader_address")
-        )
-        
-        return {
-            "country_code": result.country_code,
-            "vat_number": result.vat_number,
-            "full_vat_number": result.full_vat_number,
-            "is_valid": result.is_valid,
-            "company_name": result.company_name,
-            "company_address": result.company_address,
-            "request_date": result.request_date,
-            "request_identifier": result.request_identifier,
-            "trader_name_match": result.trader_name_match,
-            "trader_address_match": result.trader_address_match,
-            "error_message": result.error_message,
-            "validation_status": result.validation_status
-        }
+        return _validate_eu_vat(request)
     except Exception as e:
-        logger.error(f"VIES validation error: {str(e)}")
+        logger.error("VIES validation error: %s", e)
         raise HTTPException(status_code=500, detail=f"VIES validation failed: {str(e)}")
 
+@app.post("/api/v2/vat/validate-eu-vat:batch")
+async def validate_eu_vat_batch(requests: List[Dict]):
+    """Validate many EU VAT numbers concurrently; results are returned in input order"""
+    semaphore = asyncio.Semaphore(VIES_BATCH_CONCURRENCY)
+    
+    async def validate_one(request: Dict) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(_validate_eu_vat, request)
+            except Exception as e:
+                logger.error("VIES validation error: %s", e)
+                return {
+                    "country_code": request.get("country_code"),
+                    "vat_number": request.get("vat_number"),
+                    "is_valid": False,
+                    "error_message": f"VIES validation failed: {str(e)}",
+                    "validation_status": "error"
+                }
+    
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(validate_one(request)) for request in requests]
+    
+    return {"results": [task.result() for task in tasks]}
+
 # ============================================================================
 # SYSTEM INFORMATION AND STATISTICS
 # ============================================================================
@@ -444,18 +637,22 @@ def get_enhanced_system_stats(db=Depends(get_enhanced_db)):
     return stats
 
 @app.get("/api/v2/system/health")
-def health_check_v2():
+async def health_check_v2():
     """Enhanced health check"""
     try:
-        stats = get_database_stats()
-        vies_status = vies_validator.get_vies_availability()
+        # Probe database and VIES concurrently in worker threads
+        async with asyncio.timeout(3):
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(asyncio.to_thread(get_database_stats))
+                vies_task = tg.create_task(_probe_vies_status())
+        vies_status = vies_task.result()
         
         return {
             "status": "healthy",
-            "timestamp": datetime.utcnow(),
+            "timestamp": datetime.now(timezone.utc),
             "version": "3.0.0",
             "database": "connected",
-            "vies_service": "available" if vies_status.get("service_available") else "unavailable",
+            "vies_service": "unavailable" if vies_status.get("error") else "available",
             "features_active": [
                 "enhanced_models",
                 "all_document_types", 
@@ -465,12 +662,14 @@ def health_check_v2():
             ]
         }
     except Exception as e:
-        return JSONResponse(
+        if isinstance(e, ExceptionGroup):
+            e = e.exceptions[0]
+        return ORJSONResponse(
             status_code=503,
             content={
                 "status": "unhealthy",
-                "timestamp": datetime.utcnow(),
-                "error": str(e)
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "error": str(e) or type(e).__name__
             }
         )
 
@@ -478,66 +677,69 @@ def health_check_v2():
 # Helper Functions
 # ============================================================================
 
+def _validate_eu_vat(request: Dict) -> Dict[str, Any]:
+    """Validate one EU VAT number via VIES and shape the API response"""
+    result = vies_validator.validate_vat_number(
+        country_code=request.get("country_code"),
+        vat_number=request.get("vat_number"),
+        requester_country_code=request.get("requester_country_code", "BG"),
+        requester_vat_number=request.get("requester_vat"),
+        trader_name=request.get("trader_name"),
+        trader_address=request.get("trader_address")
+    )
+    
+    return {
+        "country_code": result.country_code,
+        "vat_number": result.vat_number,
+        "full_vat_number": f"{result.country_code}{result.vat_number}",
+        "is_valid": result.is_valid,
+        "company_name": result.company_name,
+        "company_address": result.company_address,
+        "request_date": result.request_date,
+        "request_identifier": result.request_identifier,
+        "trader_name_match": result.trader_name_match,
+        "trader_address_match": result.trader_address_match,
+        "error_message": result.error_message,
+        "validation_status": "valid" if result.is_valid else "invalid" if not result.error_message else "error"
+    }
+
+async def _probe_vies_status() -> Dict[str, Any]:
+    """Check VIES availability without letting a slow VIES fail the health check"""
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(vies_validator.check_service_status), timeout=2)
+    except TimeoutError:
+        return {"error": "VIES status check timed out", "available": False}
+
+
+def _dump_json_list(adapter: TypeAdapter, rows: List[Any]) -> bytes:
+    """Serialize ORM rows to JSON bytes through a list TypeAdapter"""
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+def _json_list_response(adapter: TypeAdapter, rows: List[Any]) -> Response:
+    """Return ORM rows as a JSON response without a second serialization pass"""
+    return Response(content=_dump_json_list(adapter, rows), media_type="application/json")
+
+def _etag_response(request: Request, body: bytes, etag: str) -> Response:
+    """Return a JSON response, or 304 Not Modified if the client's ETag matches"""
+    headers = {"ETag": etag, "Cache-Control": _REFERENCE_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in client_etags or "*" in client_etags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
 def _get_document_description(doc_type: int) -> str:
     """Get description for purchase document type"""
-    descriptions = {
-        1: "Standard invoice for purchases",
-        2: "Customs import document", 
-        3: "Credit note/protocol document",
-        5: "Documents per Article 15a (since 01.04.2020)",
-        7: "Aggregate invoices",
-        9: "Documents without tax credit rights",
-        11: "Triangular operations per Article 15",
-        12: "Triangular operations per Article 14", 
-        13: "Acquisitions per Article 14",
-        23: "Documents per Article 126a",
-        91: "VAT application per Article 151a, par. 1",
-        92: "VAT application per Article 151a, par. 2",
-        93: "VAT application per Article 151a, par. 3",
-        94: "VAT application per Article 151a, par. 4"
-    }
-    return descriptions.get(doc_type, "Unknown document type")
+    return _PURCHASE_DESC.get(doc_type, "Unknown document type")
 
 def _get_sales_document_description(doc_type: int) -> str:
     """Get description for sales document type"""
-    descriptions = {
-        1: "Domestic sales invoice",
-        2: "EU sales (intra-community delivery)",
-        3: "Export sales (outside EU)",
-        4: "Triangular sales operations",
-        5: "Distance selling",
-        6: "Intra-community acquisitions"
-    }
-    return descriptions.get(doc_type, "Unknown document type")
+    return _SALES_DESC.get(doc_type, "Unknown document type")
 
 def _get_field_definitions() -> Dict[str, str]:
     """Get VAT declaration field definitions"""
-    return {
-        "field_09": "Deliveries/services taxable at 20%",
-        "field_10": "VAT amount for field 09",
-        "field_11": "Deliveries/services taxable at 0%", 
-        "field_12": "Exempt deliveries/services",
-        "field_13": "Intra-community deliveries",
-        "field_14": "Exports",
-        "field_15": "Other deliveries outside Bulgaria",
-        "field_16": "Distance sales to Bulgaria",
-        "field_17": "VAT for distance sales",
-        "field_18": "Intra-community acquisitions",
-        "field_19": "VAT for intra-community acquisitions",
-        "field_20": "Other acquisitions subject to reverse charge",
-        "field_21": "VAT for other acquisitions",
-        "field_22": "Import VAT",
-        "field_23": "Corrections of previous periods",
-        "field_24": "VAT corrections", 
-        "field_25": "Other corrections",
-        "field_50": "Total sales VAT due",
-        "field_60": "Total purchase VAT deductible",
-        "field_70": "VAT due to budget",
-        "field_71": "VAT refund due from budget",
-        "field_80": "Refund amount",
-        "field_81": "Amount to pay",
-        "field_82": "Amount to refund"
-    }
+    return _FIELD_DEFS
 
 if __name__ == "__main__":
     import uvicorn
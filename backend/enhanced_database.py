@@ -1,22 +1,77 @@
-from sqlalchemy import create_engine
+from sqlalchemy import Integer, create_engine, delete, event, func, insert, inspect, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 import logging
+import os
+import sqlite3
+from typing import AsyncGenerator, Dict, Optional
+
+from sqlite_pragmas import set_sqlite_pragmas
 
 # Database URL - using SQLite for simplicity (can be changed to PostgreSQL/MySQL)
-DATABASE_URL = "sqlite:///./enhanced_vat_system.db"
+DATABASE_URL = os.getenv("ENHANCED_DATABASE_URL", "sqlite:///./enhanced_vat_system.db")
+ASYNC_DATABASE_URL = os.getenv("ENHANCED_ASYNC_DATABASE_URL", "sqlite+aiosqlite:///./enhanced_vat_system.db")
+
+def _pool_options(url: str) -> Dict:
+    """Connection pool settings for a database URL"""
+    if url.startswith("sqlite") and ":memory:" in url:
+        # An in-memory database must share one connection
+        return {
+            "connect_args": {"check_same_thread": False},
+            "poolclass": StaticPool,
+        }
+    if url.startswith("sqlite"):
+        # WAL lets readers run alongside the writer, so file databases get a
+        # real pool; SQLAlchemy already disables check_same_thread for them
+        return {
+            "pool_size": 10,
+            "max_overflow": 20,
+        }
+    # Server databases: keep warm connections for request concurrency, drop
+    # dead ones before use and recycle before server-side idle timeouts
+    options = {
+        "pool_size": 20,
+        "max_overflow": 30,
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+    }
+    # The planner's JIT only adds compile time to these short OLTP queries
+    if url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {"server_settings": {"jit": "off"}}
+    elif url.startswith("postgresql"):
+        options["connect_args"] = {"options": "-c jit=off"}
+    return options
 
 # Create engine with connection pooling
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},  # SQLite specific
-    poolclass=StaticPool,
-    echo=False  # Set to True for SQL debugging
+    query_cache_size=1200,  # compiled statement cache (default 500)
+    echo=False,  # Set to True for SQL debugging
+    **_pool_options(DATABASE_URL)
+)
+
+# Create session factory - objects stay loaded after commit (sessions are
+# request-scoped), so returned rows are serialized without a re-SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Async engine on the same database for read endpoints that should not
+# hold a threadpool worker while SQLite does I/O
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    query_cache_size=1200,
+    echo=False,
+    **_pool_options(ASYNC_DATABASE_URL)
 )
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# SQLite tuning - WAL and NORMAL sync take the fsync off most commits
+for _engine in (engine, async_engine.sync_engine):
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", set_sqlite_pragmas)
 
 # Base class for models
 Base = declarative_base()
@@ -33,26 +88,98 @@ def get_enhanced_db():
     finally:
         db.close()
 
-def create_enhanced_tables():
-    """Create all enhanced tables"""
-    try:
-        # Import all models to ensure they're registered with Base
-        from enhanced_models import (
+async def get_enhanced_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency to get async database session for enhanced models"""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+def _enhanced_tables() -> list:
+    """Tables of the enhanced models only - they share database_sync.Base's
+    metadata with the legacy models, which must not be created here"""
+    from enhanced_models import (
+        EnhancedCompany, EnhancedPurchaseEntry, EnhancedSalesEntry,
+        EnhancedVATDeclaration, VIESReport, DocumentTypeMapping, ExportLog,
+        SalesFieldTotals
+    )
+    return [
+        model.__table__ for model in (
             EnhancedCompany, EnhancedPurchaseEntry, EnhancedSalesEntry,
-            EnhancedVATDeclaration, VIESReport, DocumentTypeMapping, ExportLog
+            EnhancedVATDeclaration, VIESReport, DocumentTypeMapping, ExportLog,
+            SalesFieldTotals
+        )
+    ]
+
+def _check_money_columns(inspector, tables: list):
+    """Refuse to run on tables whose Money columns predate integer stotinki storage"""
+    from enhanced_models import Money
+    
+    # Older files declare these columns NUMERIC and hold lev amounts; SQLite
+    # stores whole amounts as INTEGER there, so the rows cannot be told apart
+    # from stotinki and converted in place - the file has to be recreated
+    stored_types = {
+        table_name: {column['name']: column['type'] for column in columns}
+        for (_, table_name), columns in inspector.get_multi_columns(
+            filter_names=[table.name for table in tables]
+        ).items()
+    }
+    legacy_tables = sorted({
+        table.name
+        for table in tables
+        for column in table.columns
+        if isinstance(column.type, Money)
+        and column.name in stored_types.get(table.name, {})
+        and not isinstance(stored_types[table.name][column.name], Integer)
+    })
+    if legacy_tables:
+        raise RuntimeError(
+            f"{engine.url.database} stores amounts in lev in {', '.join(legacy_tables)}; "
+            "Money columns hold integer stotinki since the schema change. Move the file aside, "
+            "let create_enhanced_tables() create a new one and re-run migrate_existing_data()"
         )
+
+def create_enhanced_tables(reseed_mappings: bool = False):
+    """Create all enhanced tables (reseed_mappings re-applies default document types)"""
+    try:
+        from enhanced_models import DocumentTypeMapping
+        
+        # Create the enhanced tables (and indexes). Warm starts read the table
+        # and index catalog instead of running create_all's per-table checks
+        tables = _enhanced_tables()
+        inspector = inspect(engine)
+        existing = set(inspector.get_table_names())
+        existing_tables = [table for table in tables if table.name in existing]
+        if existing_tables:
+            _check_money_columns(inspector, existing_tables)
+        if not existing.issuperset(table.name for table in tables):
+            DocumentTypeMapping.metadata.create_all(bind=engine, tables=tables)
+            logger.info("Enhanced database tables created successfully")
         
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
-        logger.info("Enhanced database tables created successfully")
+        # create_all never adds indexes to existing tables - create the ones
+        # declared on the models after the database file was made
+        if existing_tables:
+            existing_indexes = {
+                index['name']
+                for indexes in inspector.get_multi_indexes(
+                    filter_names=[table.name for table in existing_tables]
+                ).values()
+                for index in indexes
+            }
+            for table in existing_tables:
+                for index in table.indexes:
+                    if index.name not in existing_indexes:
+                        index.create(bind=engine, checkfirst=True)
+                        logger.info("Created missing index %s", index.name)
         
-        # Initialize default document type mappings after tables are created
+        # Initialize default document type mappings after tables are created -
+        # on warm starts the table is already seeded, so the seeding service
+        # and its imports are only loaded for an empty table or an explicit reseed
         try:
-            from enhanced_services import DocumentTypeMappingService
             db = SessionLocal()
             try:
-                mapping_service = DocumentTypeMappingService(db)
-                mapping_service.initialize_default_mappings()
+                if reseed_mappings or db.query(DocumentTypeMapping.id).first() is None:
+                    from enhanced_services import DocumentTypeMappingService
+                    mapping_service = DocumentTypeMappingService(db)
+                    mapping_service.initialize_default_mappings()
             finally:
                 db.close()
         except Exception as mapping_error:
@@ -62,30 +189,88 @@ def create_enhanced_tables():
         logger.error(f"Error creating enhanced tables: {str(e)}")
         raise
 
-def migrate_existing_data():
+# Rows streamed from the old database and inserted per executemany batch during migration
+MIGRATION_BATCH_SIZE = 1000
+
+def _insert_batch(session: Session, statement, rows: list):
+    """Execute a prebuilt INSERT for accumulated migration rows and empty the buffer"""
+    if rows:
+        session.execute(statement, rows)
+        rows.clear()
+
+def _restore_indexes(session: Session, indexes: list):
+    """Recreate indexes dropped for a bulk load that was rolled back"""
+    try:
+        connection = session.connection()
+        for index in indexes:
+            index.create(bind=connection, checkfirst=True)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        logger.error("Could not restore indexes after failed migration: %s", e)
+
+def _has_unique_key(connection, table_name: str, columns: tuple) -> bool:
+    """Whether the database has a unique constraint or index on exactly these columns"""
+    inspector = inspect(connection)
+    unique_keys = [constraint['column_names'] for constraint in inspector.get_unique_constraints(table_name)]
+    unique_keys += [index['column_names'] for index in inspector.get_indexes(table_name) if index['unique']]
+    return any(set(key) == set(columns) for key in unique_keys)
+
+def migrate_existing_data(session_factory: Optional[sessionmaker] = None):
     """Migrate data from existing models to enhanced models"""
     from models_sync import Company, PurchaseJournal, SalesJournal, VATDeclaration
-    from enhanced_models import EnhancedCompany, EnhancedPurchaseEntry, EnhancedSalesEntry, EnhancedVATDeclaration
+    from enhanced_models import (
+        EnhancedCompany, EnhancedPurchaseEntry, EnhancedSalesEntry, EnhancedVATDeclaration, SalesFieldTotals
+    )
     from database_sync import SessionLocal as OldSessionLocal
     
     old_db = OldSessionLocal()
-    new_db = SessionLocal()
+    new_db = (session_factory or SessionLocal)()
+    bulk_indexes = []
     
     try:
         logger.info("Starting data migration...")
         
-        # Migrate companies
-        old_companies = old_db.query(Company).all()
-        company_mapping = {}
+        # Core INSERTs built once and executed as executemany for every batch;
+        # on SQLite/PostgreSQL uq_vat_declaration_company_period lets the
+        # database skip migrated declarations; other backends, and tables
+        # created before that constraint existed, check keys here
+        purchase_insert = insert(EnhancedPurchaseEntry.__table__)
+        sales_insert = insert(EnhancedSalesEntry.__table__)
+        dialect_insert = {
+            "sqlite": sqlite_insert,
+            "postgresql": postgresql_insert,
+        }.get(new_db.get_bind().dialect.name)
+        if dialect_insert is not None and _has_unique_key(
+            new_db.connection(), EnhancedVATDeclaration.__tablename__, ("company_id", "period")
+        ):
+            declaration_insert = dialect_insert(EnhancedVATDeclaration.__table__).on_conflict_do_nothing(
+                index_elements=["company_id", "period"]
+            )
+            existing_declarations = None
+        else:
+            declaration_insert = insert(EnhancedVATDeclaration.__table__)
+            existing_declarations = {
+                tuple(key) for key in new_db.query(
+                    EnhancedVATDeclaration.company_id,
+                    EnhancedVATDeclaration.period
+                )
+            }
+        
+        # Migrate companies - already migrated UICs are loaded once
+        existing_companies = dict(new_db.query(EnhancedCompany.uic, EnhancedCompany.id).all())
+        # Old rows are read as plain Row tuples of only the migrated columns
+        old_companies = old_db.query(
+            Company.id, Company.uic, Company.vat_number, Company.name, Company.position,
+            Company.representative, Company.address, Company.is_active,
+            Company.created_at, Company.updated_at
+        ).all()
+        new_companies = []
         
         for old_company in old_companies:
             # Check if already migrated
-            existing = new_db.query(EnhancedCompany).filter(
-                EnhancedCompany.uic == old_company.uic
-            ).first()
-            
-            if not existing:
-                new_company = EnhancedCompany(
+            if old_company.uic not in existing_companies:
+                new_companies.append(dict(
                     uic=old_company.uic,
                     vat_number=old_company.vat_number,
                     name=old_company.name,
@@ -95,30 +280,61 @@ def migrate_existing_data():
                     is_active=old_company.is_active,
                     created_at=old_company.created_at,
                     updated_at=old_company.updated_at
-                )
-                new_db.add(new_company)
-                new_db.flush()  # Get the ID
-                company_mapping[old_company.id] = new_company.id
-            else:
-                company_mapping[old_company.id] = existing.id
+                ))
+        
+        # One INSERT ... RETURNING gives the new IDs without per-row flushes
+        if new_companies:
+            inserted = new_db.execute(
+                insert(EnhancedCompany).returning(EnhancedCompany.uic, EnhancedCompany.id),
+                new_companies
+            )
+            existing_companies.update((row.uic, row.id) for row in inserted)
+        company_mapping = {
+            old_company.id: existing_companies[old_company.uic]
+            for old_company in old_companies
+        }
         
-        new_db.commit()
         logger.info(f"Migrated {len(old_companies)} companies")
         
-        # Migrate purchase journals
-        old_purchases = old_db.query(PurchaseJournal).all()
+        # Non-unique journal indexes are dropped for the bulk load and rebuilt
+        # once at the end. pysqlite may run the DROPs outside the transaction,
+        # so a failed migration recreates them explicitly after the rollback
+        bulk_indexes = [
+            index
+            for model in (EnhancedPurchaseEntry, EnhancedSalesEntry, EnhancedVATDeclaration)
+            for index in model.__table__.indexes
+            if not index.unique
+        ]
+        connection = new_db.connection()
+        for index in bulk_indexes:
+            index.drop(bind=connection, checkfirst=True)
+        
+        # Migrate purchase journals - already migrated keys are loaded once
+        existing_purchases = {
+            tuple(key) for key in new_db.query(
+                EnhancedPurchaseEntry.company_id,
+                EnhancedPurchaseEntry.period,
+                EnhancedPurchaseEntry.document_number
+            )
+        }
+        old_purchases = old_db.query(
+            PurchaseJournal.company_id, PurchaseJournal.period, PurchaseJournal.document_type,
+            PurchaseJournal.document_number, PurchaseJournal.document_date,
+            PurchaseJournal.supplier_name, PurchaseJournal.supplier_vat,
+            PurchaseJournal.tax_base, PurchaseJournal.vat_amount, PurchaseJournal.total_amount,
+            PurchaseJournal.credit_tax_base, PurchaseJournal.credit_vat,
+            PurchaseJournal.notes, PurchaseJournal.created_at
+        ).yield_per(MIGRATION_BATCH_SIZE)
+        rows = []
+        migrated = 0
         for old_purchase in old_purchases:
+            migrated += 1
             new_company_id = company_mapping.get(old_purchase.company_id)
             if new_company_id:
                 # Check if already migrated
-                existing = new_db.query(EnhancedPurchaseEntry).filter(
-                    EnhancedPurchaseEntry.company_id == new_company_id,
-                    EnhancedPurchaseEntry.period == old_purchase.period,
-                    EnhancedPurchaseEntry.document_number == old_purchase.document_number
-                ).first()
-                
-                if not existing:
-                    new_purchase = EnhancedPurchaseEntry(
+                key = (new_company_id, old_purchase.period, old_purchase.document_number)
+                if key not in existing_purchases:
+                    rows.append(dict(
                         company_id=new_company_id,
                         period=old_purchase.period,
                         document_type=old_purchase.document_type,
@@ -133,26 +349,39 @@ def migrate_existing_data():
                         credit_vat=old_purchase.credit_vat,
                         notes=old_purchase.notes,
                         created_at=old_purchase.created_at
-                    )
-                    new_db.add(new_purchase)
+                    ))
+                    if len(rows) >= MIGRATION_BATCH_SIZE:
+                        _insert_batch(new_db, purchase_insert, rows)
+        _insert_batch(new_db, purchase_insert, rows)
         
-        new_db.commit()
-        logger.info(f"Migrated {len(old_purchases)} purchase entries")
+        logger.info("Migrated %d purchase entries", migrated)
         
-        # Migrate sales journals
-        old_sales = old_db.query(SalesJournal).all()
+        # Migrate sales journals - already migrated keys are loaded once
+        existing_sales = {
+            tuple(key) for key in new_db.query(
+                EnhancedSalesEntry.company_id,
+                EnhancedSalesEntry.period,
+                EnhancedSalesEntry.document_number
+            )
+        }
+        old_sales = old_db.query(
+            SalesJournal.company_id, SalesJournal.period, SalesJournal.document_number,
+            SalesJournal.document_date, SalesJournal.customer_name, SalesJournal.customer_vat,
+            SalesJournal.tax_base_20, SalesJournal.vat_20, SalesJournal.tax_base_0,
+            SalesJournal.tax_base_exempt, SalesJournal.total_amount,
+            SalesJournal.notes, SalesJournal.created_at
+        ).yield_per(MIGRATION_BATCH_SIZE)
+        migrated = 0
+        sales_companies = set()
         for old_sale in old_sales:
+            migrated += 1
             new_company_id = company_mapping.get(old_sale.company_id)
             if new_company_id:
                 # Check if already migrated
-                existing = new_db.query(EnhancedSalesEntry).filter(
-                    EnhancedSalesEntry.company_id == new_company_id,
-                    EnhancedSalesEntry.period == old_sale.period,
-                    EnhancedSalesEntry.document_number == old_sale.document_number
-                ).first()
-                
-                if not existing:
-                    new_sale = EnhancedSalesEntry(
+                key = (new_company_id, old_sale.period, old_sale.document_number)
+                if key not in existing_sales:
+                    sales_companies.add(new_company_id)
+                    rows.append(dict(
                         company_id=new_company_id,
                         period=old_sale.period,
                         document_type=1,  # Default to domestic invoice
@@ -171,53 +400,118 @@ def migrate_existing_data():
                         field_12=old_sale.tax_base_exempt,  # Map to field 12
                         notes=old_sale.notes,
                         created_at=old_sale.created_at
-                    )
-                    new_db.add(new_sale)
+                    ))
+                    if len(rows) >= MIGRATION_BATCH_SIZE:
+                        _insert_batch(new_db, sales_insert, rows)
+        _insert_batch(new_db, sales_insert, rows)
         
-        new_db.commit()
-        logger.info(f"Migrated {len(old_sales)} sales entries")
+        # Bulk-loaded sales bypass the materialized field totals - drop the
+        # affected rows so they are re-seeded from the journal on the next insert
+        if sales_companies:
+            new_db.execute(delete(SalesFieldTotals).where(SalesFieldTotals.company_id.in_(sales_companies)))
+        
+        logger.info("Migrated %d sales entries", migrated)
         
-        # Migrate VAT declarations
-        old_declarations = old_db.query(VATDeclaration).all()
+        # Migrate VAT declarations - already migrated (company_id, period)
+        # rows are skipped by declaration_insert's ON CONFLICT clause or the key set
+        old_declarations = old_db.query(
+            VATDeclaration.company_id, VATDeclaration.period,
+            VATDeclaration.field_50, VATDeclaration.field_60, VATDeclaration.field_80,
+            VATDeclaration.payment_due, VATDeclaration.refund_due, VATDeclaration.status,
+            VATDeclaration.submission_date, VATDeclaration.payment_deadline,
+            VATDeclaration.nap_submission_id, VATDeclaration.created_at, VATDeclaration.updated_at
+        ).yield_per(MIGRATION_BATCH_SIZE)
+        migrated = 0
         for old_decl in old_declarations:
+            migrated += 1
             new_company_id = company_mapping.get(old_decl.company_id)
             if new_company_id:
-                # Check if already migrated
-                existing = new_db.query(EnhancedVATDeclaration).filter(
-                    EnhancedVATDeclaration.company_id == new_company_id,
-                    EnhancedVATDeclaration.period == old_decl.period
-                ).first()
-                
-                if not existing:
-                    new_decl = EnhancedVATDeclaration(
-                        company_id=new_company_id,
-                        period=old_decl.period,
-                        field_50=old_decl.field_50,
-                        field_60=old_decl.field_60,
-                        field_80=old_decl.field_80,
-                        payment_due=old_decl.payment_due,
-                        refund_due=old_decl.refund_due,
-                        status=old_decl.status,
-                        submission_date=old_decl.submission_date,
-                        payment_deadline=old_decl.payment_deadline,
-                        nap_submission_id=old_decl.nap_submission_id,
-                        created_at=old_decl.created_at,
-                        updated_at=old_decl.updated_at
-                    )
-                    new_db.add(new_decl)
+                if existing_declarations is not None:
+                    key = (new_company_id, old_decl.period)
+                    if key in existing_declarations:
+                        continue
+                    existing_declarations.add(key)
+                rows.append(dict(
+                    company_id=new_company_id,
+                    period=old_decl.period,
+                    field_50=old_decl.field_50,
+                    field_60=old_decl.field_60,
+                    field_80=old_decl.field_80,
+                    payment_due=old_decl.payment_due,
+                    refund_due=old_decl.refund_due,
+                    status=old_decl.status,
+                    submission_date=old_decl.submission_date,
+                    payment_deadline=old_decl.payment_deadline,
+                    nap_submission_id=old_decl.nap_submission_id,
+                    created_at=old_decl.created_at,
+                    updated_at=old_decl.updated_at
+                ))
+                if len(rows) >= MIGRATION_BATCH_SIZE:
+                    _insert_batch(new_db, declaration_insert, rows)
+        _insert_batch(new_db, declaration_insert, rows)
+        
+        logger.info("Migrated %d VAT declarations", migrated)
         
+        for index in bulk_indexes:
+            index.create(bind=connection, checkfirst=True)
+        
+        # Single commit - the whole migration is one transaction
         new_db.commit()
-        logger.info(f"Migrated {len(old_declarations)} VAT declarations")
         logger.info("Data migration completed successfully")
         
     except Exception as e:
         logger.error(f"Error during data migration: {str(e)}")
         new_db.rollback()
+        if bulk_indexes:
+            _restore_indexes(new_db, bulk_indexes)
         raise
     finally:
         old_db.close()
         new_db.close()
 
+
+def migrate_to_memory_then_persist():
+    """Run the migration in an in-memory copy of the enhanced database, then
+    write it back in one pass with VACUUM INTO (offline use only)"""
+    from enhanced_models import EnhancedCompany
+    
+    db_path = engine.url.database
+    tmp_path = f"{db_path}.migrating"
+    memory_engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    try:
+        # Start from the current contents so already migrated rows are still skipped
+        if os.path.exists(db_path):
+            source = sqlite3.connect(db_path)
+            try:
+                with memory_engine.connect() as conn:
+                    source.backup(conn.connection.driver_connection)
+            finally:
+                source.close()
+        tables = _enhanced_tables()
+        _check_money_columns(inspect(memory_engine), tables)
+        EnhancedCompany.metadata.create_all(bind=memory_engine, tables=tables)
+        
+        migrate_existing_data(sessionmaker(autocommit=False, autoflush=False, bind=memory_engine))
+        
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        with memory_engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM INTO ?", (tmp_path,))
+    finally:
+        memory_engine.dispose()
+    
+    # Swap the compacted file in; stale WAL/SHM files must not be replayed onto it
+    engine.dispose()
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    os.replace(tmp_path, db_path)
+    logger.info("Migrated database written to %s", db_path)
+
 def get_database_stats():
     """Get statistics about the enhanced database"""
     db = SessionLocal()
@@ -227,23 +521,29 @@ def get_database_stats():
             EnhancedVATDeclaration, VIESReport, DocumentTypeMapping, ExportLog
         )
         
-        stats = {
-            'companies': db.query(EnhancedCompany).count(),
-            'purchase_entries': db.query(EnhancedPurchaseEntry).count(),
-            'sales_entries': db.query(EnhancedSalesEntry).count(),
-            'vat_declarations': db.query(EnhancedVATDeclaration).count(),
-            'vies_reports': db.query(VIESReport).count(),
-            'document_type_mappings': db.query(DocumentTypeMapping).count(),
-            'export_logs': db.query(ExportLog).count()
+        tables = {
+            'companies': EnhancedCompany,
+            'purchase_entries': EnhancedPurchaseEntry,
+            'sales_entries': EnhancedSalesEntry,
+            'vat_declarations': EnhancedVATDeclaration,
+            'vies_reports': VIESReport,
+            'document_type_mappings': DocumentTypeMapping,
+            'export_logs': ExportLog
         }
         
-        return stats
+        # All counts in one round-trip: SELECT (SELECT count(*) ...), (SELECT count(*) ...), ...
+        row = db.execute(select(*[
+            select(func.count()).select_from(model).scalar_subquery().label(name)
+            for name, model in tables.items()
+        ])).one()
+        
+        return dict(row._mapping)
     finally:
         db.close()
 
 if __name__ == "__main__":
-    # Initialize database
-    create_enhanced_tables()
+    # Initialize database (re-applying default document type mappings)
+    create_enhanced_tables(reseed_mappings=True)
     
     # Optional: Migrate existing data
     try:
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Numeric, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, ForeignKey, Text, JSON, Index, UniqueConstraint
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from enum import Enum
 
 from database_sync import Base
@@ -37,6 +39,21 @@ class VATDeclarationStatus(Enum):
     PAID = "PAID"
     REJECTED = "REJECTED"
 
+class Money(TypeDecorator):
+    """Monetary amount exposed as Decimal and stored as integer stotinki"""
+    impl = BigInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return int((Decimal(str(value)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return Decimal(value).scaleb(-2)
+
 # Enhanced Company model (minimal changes needed)
 class EnhancedCompany(Base):
     """Enhanced Company model with additional fields"""
@@ -68,6 +85,12 @@ class EnhancedCompany(Base):
 class EnhancedPurchaseEntry(Base):
     """Enhanced Purchase Journal with support for all NRA document types"""
     __tablename__ = "purchase_entries_enhanced"
+    __table_args__ = (
+        # Leading (company_id, period) serves every journal/totals query; document_type
+        # lets the per-type summary and VIES type filters group and filter from the index
+        Index("ix_purchase_company_period_doctype", "company_id", "period", "document_type"),
+        Index("ix_purchase_dedup", "company_id", "period", "document_number"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies_enhanced.id"), nullable=False)
@@ -82,11 +105,11 @@ class EnhancedPurchaseEntry(Base):
     supplier_country = Column(String(2))  # ISO country code for EU VAT
     
     # Basic amounts (existing fields)
-    tax_base = Column(Numeric(15, 2), default=0)
-    vat_amount = Column(Numeric(15, 2), default=0) 
-    total_amount = Column(Numeric(15, 2), default=0)
-    credit_tax_base = Column(Numeric(15, 2), default=0)
-    credit_vat = Column(Numeric(15, 2), default=0)
+    tax_base = Column(Money, default=0)
+    vat_amount = Column(Money, default=0) 
+    total_amount = Column(Money, default=0)
+    credit_tax_base = Column(Money, default=0)
+    credit_vat = Column(Money, default=0)
     
     # Enhanced fields for different document types
     customs_document_ref = Column(String(100))        # For type 02 (Customs)
@@ -131,6 +154,12 @@ class EnhancedPurchaseEntry(Base):
 class EnhancedSalesEntry(Base):
     """Enhanced Sales Journal with field mapping system (9-25)"""
     __tablename__ = "sales_entries_enhanced"
+    __table_args__ = (
+        # Leading (company_id, period) serves every journal/totals query; document_type
+        # lets the per-type summary and VIES type filters group and filter from the index
+        Index("ix_sales_company_period_doctype", "company_id", "period", "document_type"),
+        Index("ix_sales_dedup", "company_id", "period", "document_number"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies_enhanced.id"), nullable=False)
@@ -145,30 +174,30 @@ class EnhancedSalesEntry(Base):
     customer_country = Column(String(2))  # ISO country code
     
     # Basic VAT fields (existing)
-    tax_base_20 = Column(Numeric(15, 2), default=0)
-    vat_20 = Column(Numeric(15, 2), default=0)
-    tax_base_0 = Column(Numeric(15, 2), default=0)
-    tax_base_exempt = Column(Numeric(15, 2), default=0)
-    total_amount = Column(Numeric(15, 2), default=0)
+    tax_base_20 = Column(Money, default=0)
+    vat_20 = Column(Money, default=0)
+    tax_base_0 = Column(Money, default=0)
+    tax_base_exempt = Column(Money, default=0)
+    total_amount = Column(Money, default=0)
     
     # Enhanced fields mapping to NRA fields 9-25
-    field_09 = Column(Numeric(15, 2), default=0)   # Deliveries/services taxable at 20%
-    field_10 = Column(Numeric(15, 2), default=0)   # VAT amount for field 09
-    field_11 = Column(Numeric(15, 2), default=0)   # Deliveries/services taxable at 0%
-    field_12 = Column(Numeric(15, 2), default=0)   # Exempt deliveries/services
-    field_13 = Column(Numeric(15, 2), default=0)   # Intra-community deliveries
-    field_14 = Column(Numeric(15, 2), default=0)   # Exports
-    field_15 = Column(Numeric(15, 2), default=0)   # Other deliveries outside Bulgaria
-    field_16 = Column(Numeric(15, 2), default=0)   # Distance sales to Bulgaria
-    field_17 = Column(Numeric(15, 2), default=0)   # VAT for distance sales
-    field_18 = Column(Numeric(15, 2), default=0)   # Intra-community acquisitions
-    field_19 = Column(Numeric(15, 2), default=0)   # VAT for intra-community acquisitions
-    field_20 = Column(Numeric(15, 2), default=0)   # Other acquisitions subject to reverse charge
-    field_21 = Column(Numeric(15, 2), default=0)   # VAT for other acquisitions
-    field_22 = Column(Numeric(15, 2), default=0)   # Import VAT
-    field_23 = Column(Numeric(15, 2), default=0)   # Corrections of previous periods
-    field_24 = Column(Numeric(15, 2), default=0)   # VAT corrections
-    field_25 = Column(Numeric(15, 2), default=0)   # Other corrections
+    field_09 = Column(Money, default=0)   # Deliveries/services taxable at 20%
+    field_10 = Column(Money, default=0)   # VAT amount for field 09
+    field_11 = Column(Money, default=0)   # Deliveries/services taxable at 0%
+    field_12 = Column(Money, default=0)   # Exempt deliveries/services
+    field_13 = Column(Money, default=0)   # Intra-community deliveries
+    field_14 = Column(Money, default=0)   # Exports
+    field_15 = Column(Money, default=0)   # Other deliveries outside Bulgaria
+    field_16 = Column(Money, default=0)   # Distance sales to Bulgaria
+    field_17 = Column(Money, default=0)   # VAT for distance sales
+    field_18 = Column(Money, default=0)   # Intra-community acquisitions
+    field_19 = Column(Money, default=0)   # VAT for intra-community acquisitions
+    field_20 = Column(Money, default=0)   # Other acquisitions subject to reverse charge
+    field_21 = Column(Money, default=0)   # VAT for other acquisitions
+    field_22 = Column(Money, default=0)   # Import VAT
+    field_23 = Column(Money, default=0)   # Corrections of previous periods
+    field_24 = Column(Money, default=0)   # VAT corrections
+    field_25 = Column(Money, default=0)   # Other corrections
     
     # EU/Triangular operation specific fields
     eu_distance_selling = Column(Boolean, default=False)
@@ -191,95 +220,68 @@ class EnhancedSalesEntry(Base):
 class EnhancedVATDeclaration(Base):
     """Enhanced VAT Declaration with full field support (fields 1-82)"""
     __tablename__ = "vat_declarations_enhanced"
+    __table_args__ = (
+        # One declaration per company and period (also serves company/period lookups)
+        UniqueConstraint("company_id", "period", name="uq_vat_declaration_company_period"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies_enhanced.id"), nullable=False)
     period = Column(String(6), nullable=False, index=True)
     period_type = Column(String(10), default="MONTHLY")  # MONTHLY or QUARTERLY
     
+    # Reserved fields stay real columns: SQLite stores a zero in the record
+    # header alone (serial type 8), so each costs one byte and the flat
+    # field_NN shape used by the schemas and NRA export is kept. They are
+    # generated in the class body, keeping table column order by field number
+    
     # Section A - Sales (Fields 9-40)
-    field_09 = Column(Numeric(15, 2), default=0)  # Deliveries/services taxable at 20%
-    field_10 = Column(Numeric(15, 2), default=0)  # VAT amount for field 09  
-    field_11 = Column(Numeric(15, 2), default=0)  # Deliveries/services taxable at 0%
-    field_12 = Column(Numeric(15, 2), default=0)  # Exempt deliveries/services
-    field_13 = Column(Numeric(15, 2), default=0)  # Intra-community deliveries
-    field_14 = Column(Numeric(15, 2), default=0)  # Exports
-    field_15 = Column(Numeric(15, 2), default=0)  # Other deliveries outside Bulgaria
-    field_16 = Column(Numeric(15, 2), default=0)  # Distance sales to Bulgaria
-    field_17 = Column(Numeric(15, 2), default=0)  # VAT for distance sales
-    field_18 = Column(Numeric(15, 2), default=0)  # Intra-community acquisitions
-    field_19 = Column(Numeric(15, 2), default=0)  # VAT for intra-community acquisitions
-    field_20 = Column(Numeric(15, 2), default=0)  # Other acquisitions subject to reverse charge
-    field_21 = Column(Numeric(15, 2), default=0)  # VAT for other acquisitions
-    field_22 = Column(Numeric(15, 2), default=0)  # Import VAT
-    field_23 = Column(Numeric(15, 2), default=0)  # Corrections of previous periods
-    field_24 = Column(Numeric(15, 2), default=0)  # VAT corrections
-    field_25 = Column(Numeric(15, 2), default=0)  # Other corrections
-    field_26 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_27 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_28 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_29 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_30 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_31 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_32 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_33 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_34 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_35 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_36 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_37 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_38 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_39 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_40 = Column(Numeric(15, 2), default=0)  # Reserved
+    field_09 = Column(Money, default=0)  # Deliveries/services taxable at 20%
+    field_10 = Column(Money, default=0)  # VAT amount for field 09  
+    field_11 = Column(Money, default=0)  # Deliveries/services taxable at 0%
+    field_12 = Column(Money, default=0)  # Exempt deliveries/services
+    field_13 = Column(Money, default=0)  # Intra-community deliveries
+    field_14 = Column(Money, default=0)  # Exports
+    field_15 = Column(Money, default=0)  # Other deliveries outside Bulgaria
+    field_16 = Column(Money, default=0)  # Distance sales to Bulgaria
+    field_17 = Column(Money, default=0)  # VAT for distance sales
+    field_18 = Column(Money, default=0)  # Intra-community acquisitions
+    field_19 = Column(Money, default=0)  # VAT for intra-community acquisitions
+    field_20 = Column(Money, default=0)  # Other acquisitions subject to reverse charge
+    field_21 = Column(Money, default=0)  # VAT for other acquisitions
+    field_22 = Column(Money, default=0)  # Import VAT
+    field_23 = Column(Money, default=0)  # Corrections of previous periods
+    field_24 = Column(Money, default=0)  # VAT corrections
+    field_25 = Column(Money, default=0)  # Other corrections
+    for _n in range(26, 41):  # Reserved fields 26-40
+        vars()[f"field_{_n:02d}"] = Column(Money, default=0)
     
     # Section B - Calculations (Fields 41-69)
-    field_41 = Column(Numeric(15, 2), default=0)  # Total tax base
-    field_42 = Column(Numeric(15, 2), default=0)  # Total VAT due
-    field_43 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_44 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_45 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_46 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_47 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_48 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_49 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_50 = Column(Numeric(15, 2), default=0)  # Sales VAT (existing field)
-    field_51 = Column(Numeric(15, 2), default=0)  # Purchase VAT deductible
-    field_52 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_53 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_54 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_55 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_56 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_57 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_58 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_59 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_60 = Column(Numeric(15, 2), default=0)  # Purchase VAT (existing field)
-    field_61 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_62 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_63 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_64 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_65 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_66 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_67 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_68 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_69 = Column(Numeric(15, 2), default=0)  # Reserved
+    field_41 = Column(Money, default=0)  # Total tax base
+    field_42 = Column(Money, default=0)  # Total VAT due
+    for _n in range(43, 50):  # Reserved fields 43-49
+        vars()[f"field_{_n:02d}"] = Column(Money, default=0)
+    field_50 = Column(Money, default=0)  # Sales VAT (existing field)
+    field_51 = Column(Money, default=0)  # Purchase VAT deductible
+    for _n in range(52, 60):  # Reserved fields 52-59
+        vars()[f"field_{_n:02d}"] = Column(Money, default=0)
+    field_60 = Column(Money, default=0)  # Purchase VAT (existing field)
+    for _n in range(61, 70):  # Reserved fields 61-69
+        vars()[f"field_{_n:02d}"] = Column(Money, default=0)
     
     # Section V - Final calculations (Fields 70-82)
-    field_70 = Column(Numeric(15, 2), default=0)  # VAT due to budget
-    field_71 = Column(Numeric(15, 2), default=0)  # VAT refund due
-    field_72 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_73 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_74 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_75 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_76 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_77 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_78 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_79 = Column(Numeric(15, 2), default=0)  # Reserved
-    field_80 = Column(Numeric(15, 2), default=0)  # Refund amount (existing field)
-    field_81 = Column(Numeric(15, 2), default=0)  # Amount to pay
-    field_82 = Column(Numeric(15, 2), default=0)  # Amount to refund
+    field_70 = Column(Money, default=0)  # VAT due to budget
+    field_71 = Column(Money, default=0)  # VAT refund due
+    for _n in range(72, 80):  # Reserved fields 72-79
+        vars()[f"field_{_n:02d}"] = Column(Money, default=0)
+    field_80 = Column(Money, default=0)  # Refund amount (existing field)
+    field_81 = Column(Money, default=0)  # Amount to pay
+    field_82 = Column(Money, default=0)  # Amount to refund
+    del _n
     
     # Calculated totals (existing fields)
-    payment_due = Column(Numeric(15, 2), default=0)
-    refund_due = Column(Numeric(15, 2), default=0)
+    payment_due = Column(Money, default=0)
+    refund_due = Column(Money, default=0)
     
     # Enhanced status tracking
     status = Column(String(20), default="DRAFT")
@@ -301,9 +303,30 @@ class EnhancedVATDeclaration(Base):
     # Relationships
     company = relationship("EnhancedCompany", back_populates="vat_declarations")
 
+class SalesFieldTotals(Base):
+    """Materialized sales field totals (9-25) per company and period"""
+    __tablename__ = "sales_field_totals"
+    
+    company_id = Column(Integer, ForeignKey("companies_enhanced.id"), primary_key=True)
+    period = Column(String(6), primary_key=True)
+    
+    # Journal rows folded into the totals (count and highest id) - the row is
+    # only read while these match the journal's live count/max(id)
+    entry_count = Column(Integer, nullable=False, default=0)
+    last_entry_id = Column(Integer, nullable=False, default=0)
+    
+    for _n in range(9, 26):  # Sales fields 9-25
+        vars()[f"field_{_n:02d}"] = Column(Money, default=0)
+    del _n
+    
+    refreshed_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class VIESReport(Base):
     """VIES-specific reporting model"""
     __tablename__ = "vies_reports"
+    __table_args__ = (
+        Index("ix_vies_report_company_period", "company_id", "period"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     company_id = Column(Integer, ForeignKey("companies_enhanced.id"), nullable=False)
@@ -311,8 +334,8 @@ class VIESReport(Base):
     
     # VIES-specific data
     eu_customers = Column(JSON)           # List of EU customers with transactions
-    total_eu_sales = Column(Numeric(15, 2), default=0)
-    total_triangular_ops = Column(Numeric(15, 2), default=0)
+    total_eu_sales = Column(Money, default=0)
+    total_triangular_ops = Column(Money, default=0)
     
     # Report status
     generated_date = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, validator
 from typing import Optional, Dict, List, Any
 from datetime import datetime
 from decimal import Decimal
@@ -50,8 +50,7 @@ class EnhancedCompanyResponse(EnhancedCompanyBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
 # Enhanced Purchase Entry Schemas
 class EnhancedPurchaseEntryBase(BaseModel):
@@ -102,8 +101,7 @@ class EnhancedPurchaseEntryResponse(EnhancedPurchaseEntryBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
 # Enhanced Sales Entry Schemas
 class EnhancedSalesEntryBase(BaseModel):
@@ -160,8 +158,7 @@ class EnhancedSalesEntryResponse(EnhancedSalesEntryBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
 # Enhanced VAT Declaration Schemas
 class EnhancedVATDeclarationBase(BaseModel):
@@ -271,8 +268,7 @@ class EnhancedVATDeclarationResponse(EnhancedVATDeclarationBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
 # VIES Report Schemas
 class VIESReportBase(BaseModel):
@@ -291,8 +287,7 @@ class VIESReportResponse(VIESReportBase):
     submitted_date: Optional[datetime] = None
     vies_reference: Optional[str] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
 # Document Type Mapping Schemas
 class DocumentTypeMappingBase(BaseModel):
@@ -315,8 +310,7 @@ class DocumentTypeMappingResponse(DocumentTypeMappingBase):
     id: int
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
 # Export Log Schemas
 class ExportLogBase(BaseModel):
@@ -340,11 +334,23 @@ class ExportLogResponse(ExportLogBase):
     created_at: datetime
     completed_at: Optional[datetime] = None
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, defer_build=True)
 
 # Validation utilities
 class DocumentTypeValidator:
+    # Document type groups sharing a requirement, built once for the per-entry checks
+    TRIANGULAR_PURCHASE_TYPES = frozenset({
+        PurchaseDocumentType.TRIANGULAR_ART15,
+        PurchaseDocumentType.TRIANGULAR_ART14,
+        PurchaseDocumentType.ACQUISITIONS_ART14,
+    })
+    VAT_APPLICATION_TYPES = frozenset({
+        PurchaseDocumentType.VAT_APP_151A_1,
+        PurchaseDocumentType.VAT_APP_151A_2,
+        PurchaseDocumentType.VAT_APP_151A_3,
+        PurchaseDocumentType.VAT_APP_151A_4,
+    })
+    
     @staticmethod
     def validate_purchase_document_type(doc_type: int, entry_data: Dict[str, Any]) -> List[str]:
         """Validate purchase document type specific requirements"""
@@ -362,16 +368,11 @@ class DocumentTypeValidator:
             if not entry_data.get("aggregate_period_from") or not entry_data.get("aggregate_period_to"):
                 errors.append("Aggregate period range is required for type 07")
                 
-        elif doc_type in [PurchaseDocumentType.TRIANGULAR_ART15, 
-                         PurchaseDocumentType.TRIANGULAR_ART14,
-                         PurchaseDocumentType.ACQUISITIONS_ART14]:
+        elif doc_type in DocumentTypeValidator.TRIANGULAR_PURCHASE_TYPES:
             if not entry_data.get("triangular_operation_type"):
                 errors.append("Triangular operation type is required for triangular operations")
                 
-        elif doc_type in [PurchaseDocumentType.VAT_APP_151A_1,
-                         PurchaseDocumentType.VAT_APP_151A_2,
-                         PurchaseDocumentType.VAT_APP_151A_3,
-                         PurchaseDocumentType.VAT_APP_151A_4]:
+        elif doc_type in DocumentTypeValidator.VAT_APPLICATION_TYPES:
             if not entry_data.get("application_reference"):
                 errors.append("Application reference is required for VAT applications")
                 
@@ -1,24 +1,104 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, extract
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, case, exists, func, extract, insert, update
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Dict, Any, Set, Tuple
+from datetime import date, datetime, timedelta
+from dateutil.relativedelta import relativedelta
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import logging
 import json
+import os
+
+try:
+    from lxml import etree
+except ImportError:  # stdlib ElementTree has the same Element/SubElement/write API
+    import xml.etree.ElementTree as etree
 
 from enhanced_models import (
     EnhancedCompany, EnhancedPurchaseEntry, EnhancedSalesEntry, 
     EnhancedVATDeclaration, VIESReport, DocumentTypeMapping, ExportLog,
-    PurchaseDocumentType, SalesDocumentType
+    SalesFieldTotals, Money, PurchaseDocumentType, SalesDocumentType
 )
 from enhanced_schemas import (
     EnhancedCompanyCreate, EnhancedPurchaseEntryCreate, EnhancedSalesEntryCreate,
     EnhancedVATDeclarationCreate, VIESReportCreate, DocumentTypeValidator
 )
-from vies_validation_service import VIESValidationService
+from vies_validation_service import VATValidationResult, vies_validator
 
 logger = logging.getLogger(__name__)
 
+# Maximum concurrent VIES requests while validating a bulk batch
+VIES_MAX_WORKERS = 8
+
+# Sales journal declaration fields (9-25), resolved once instead of per call
+SALES_FIELD_NAMES = [f'field_{field_num:02d}' for field_num in range(9, 26)]
+SALES_FIELD_SUMS = [
+    func.sum(getattr(EnhancedSalesEntry, field_name)).label(field_name)
+    for field_name in SALES_FIELD_NAMES
+]
+
+# Creditable purchase VAT (field 60): VAT less credit VAT, skipping entries excluded from tax credit
+CREDITABLE_PURCHASE_VAT_SUM = func.coalesce(
+    func.sum(
+        func.coalesce(EnhancedPurchaseEntry.vat_amount, 0) - func.coalesce(EnhancedPurchaseEntry.credit_vat, 0),
+        type_=Money
+    ),
+    0, type_=Money
+)
+CREDIT_ELIGIBLE_PURCHASE = func.coalesce(EnhancedPurchaseEntry.tax_credit_excluded, False).is_(False)
+
+# Sales document types reported in VIES
+EU_SALES_DOCUMENT_TYPES = (
+    SalesDocumentType.EU_SALES.value,
+    SalesDocumentType.TRIANGULAR_SALES.value,
+    SalesDocumentType.DISTANCE_SELLING.value,
+)
+
+# Directory for generated NAP export files
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+
+@lru_cache(maxsize=256)
+def _parse_period(period: str) -> Tuple[int, int, date]:
+    """Split a YYYYMM period into (year, month, first day of the month)"""
+    year, month = int(period[:4]), int(period[4:6])
+    return year, month, date(year, month, 1)
+
+def get_company_or_raise(db: Session, company_uic: str) -> EnhancedCompany:
+    """Resolve a company by UIC, cached on the session so every service in a request shares it"""
+    cache = db.info.setdefault('company_cache', {})
+    company = cache.get(company_uic)
+    if company is None:
+        company = db.query(EnhancedCompany).filter(EnhancedCompany.uic == company_uic).first()
+        if not company:
+            raise ValueError(f"Company with UIC {company_uic} not found")
+        cache[company_uic] = company
+    return company
+
+def _check_vies(vies_service, vies_key: Tuple[str, str], company: EnhancedCompany) -> Optional[VATValidationResult]:
+    """Validate one (country_code, vat_number) pair via VIES, or None if the call failed"""
+    country_code, vat_number = vies_key
+    try:
+        return vies_service.validate_vat_number(
+            country_code=country_code,
+            vat_number=vat_number,
+            requester_country_code="BG",
+            requester_vat_number=company.vat_number
+        )
+    except Exception as e:
+        logger.error("VIES validation error: %s", e)
+        return None
+
+def _check_vies_many(vies_service, vies_keys: Set[Tuple[str, str]], company: EnhancedCompany) -> Dict[Tuple[str, str], Optional[VATValidationResult]]:
+    """Validate each distinct (country_code, vat_number) pair once, concurrently"""
+    if len(vies_keys) <= 1:
+        return {key: _check_vies(vies_service, key, company) for key in vies_keys}
+    keys = list(vies_keys)
+    with ThreadPoolExecutor(max_workers=min(VIES_MAX_WORKERS, len(keys))) as executor:
+        results = executor.map(lambda key: _check_vies(vies_service, key, company), keys)
+        return dict(zip(keys, results))
+
 class EnhancedCompanyService:
     """Enhanced company service with additional NRA features"""
     
@@ -28,18 +108,12 @@ class EnhancedCompanyService:
     def create_company(self, company_data: EnhancedCompanyCreate) -> EnhancedCompany:
         """Create a new enhanced company with validation"""
         
-        # Check if UIC already exists
-        existing_company = self.db.query(EnhancedCompany).filter(
-            EnhancedCompany.uic == company_data.uic
-        ).first()
-        if existing_company:
+        # Check if UIC already exists (EXISTS stops at the first match, no row is loaded)
+        if self.db.query(exists().where(EnhancedCompany.uic == company_data.uic)).scalar():
             raise ValueError(f"Company with UIC {company_data.uic} already exists")
         
         # Check if VAT number already exists
-        existing_vat = self.db.query(EnhancedCompany).filter(
-            EnhancedCompany.vat_number == company_data.vat_number
-        ).first()
-        if existing_vat:
+        if self.db.query(exists().where(EnhancedCompany.vat_number == company_data.vat_number)).scalar():
             raise ValueError(f"Company with VAT {company_data.vat_number} already exists")
             
         # Create company
@@ -48,12 +122,15 @@ class EnhancedCompanyService:
         self.db.commit()
         self.db.refresh(db_company)
         
-        logger.info(f"Created enhanced company: {db_company.name} (UIC: {db_company.uic})")
+        logger.info("Created enhanced company: %s (UIC: %s)", db_company.name, db_company.uic)
         return db_company
         
     def get_company(self, uic: str) -> Optional[EnhancedCompany]:
         """Get company by UIC"""
-        return self.db.query(EnhancedCompany).filter(EnhancedCompany.uic == uic).first()
+        try:
+            return get_company_or_raise(self.db, uic)
+        except ValueError:
+            return None
         
     def list_companies(self, active_only: bool = True) -> List[EnhancedCompany]:
         """List all companies"""
@@ -67,76 +144,113 @@ class EnhancedPurchaseService:
     
     def __init__(self, db: Session):
         self.db = db
-        self.vies_service = VIESValidationService()
+        self.vies_service = vies_validator  # shared instance, so its result cache outlives the request
         
     def create_purchase_entry(self, company_uic: str, entry_data: EnhancedPurchaseEntryCreate) -> EnhancedPurchaseEntry:
         """Create purchase entry with document type validation"""
         
         # Get company
-        company = self.db.query(EnhancedCompany).filter(
-            EnhancedCompany.uic == company_uic
-        ).first()
-        if not company:
-            raise ValueError(f"Company with UIC {company_uic} not found")
+        company = get_company_or_raise(self.db, company_uic)
             
-        # Validate document type specific requirements
+        # Validate document type specific requirements (one dict serves validation and the insert)
+        entry_dict = entry_data.dict()
         validation_errors = DocumentTypeValidator.validate_purchase_document_type(
-            entry_data.document_type.value, entry_data.dict()
+            entry_data.document_type.value, entry_dict
         )
         if validation_errors:
             raise ValueError(f"Validation errors: {', '.join(validation_errors)}")
             
-        # Auto-validate EU VAT numbers if present
-        vies_data = {}
+        # Create entry
+        entry_dict.update(self._validate_supplier_vies(entry_data, company))
+        entry_dict['company_id'] = company.id
+        
+        # RETURNING hydrates the new row (id and defaults) in the INSERT round trip
+        db_entry = self.db.scalars(
+            insert(EnhancedPurchaseEntry).returning(EnhancedPurchaseEntry), [entry_dict]
+        ).one()
+        self.db.commit()
+        
+        logger.info("Created purchase entry type %s for company %s", entry_data.document_type.value, company_uic)
+        return db_entry
+        
+    def create_many(self, company_uic: str, entries: List[EnhancedPurchaseEntryCreate]) -> List[EnhancedPurchaseEntry]:
+        """Create several purchase entries in a single transaction"""
+        company = get_company_or_raise(self.db, company_uic)
+            
+        # Validate everything up front so the batch is all-or-nothing
+        rows = []
+        for idx, entry_data in enumerate(entries):
+            entry_dict = entry_data.dict()
+            validation_errors = DocumentTypeValidator.validate_purchase_document_type(
+                entry_data.document_type.value, entry_dict
+            )
+            if validation_errors:
+                raise ValueError(f"Entry {idx + 1}: Validation errors: {', '.join(validation_errors)}")
+            rows.append(entry_dict)
+            
+        # One VIES check per distinct supplier, then stamp every entry
+        vies_keys = {key for key in map(self._supplier_vies_key, entries) if key}
+        vies_results = _check_vies_many(self.vies_service, vies_keys, company)
+        for entry_dict, entry_data in zip(rows, entries):
+            entry_dict.update(self._validate_supplier_vies(entry_data, company, vies_results))
+            entry_dict['company_id'] = company.id
+            
+        if not rows:
+            return []
+            
+        db_entries = self.db.scalars(
+            insert(EnhancedPurchaseEntry).returning(EnhancedPurchaseEntry), rows
+        ).all()
+        self.db.commit()
+        
+        logger.info("Created %s purchase entries for company %s", len(db_entries), company_uic)
+        return db_entries
+        
+    @staticmethod
+    def _supplier_vies_key(entry_data: EnhancedPurchaseEntryCreate) -> Optional[Tuple[str, str]]:
+        """(country_code, vat_number) to check for an EU supplier, None otherwise"""
         if entry_data.supplier_vat and entry_data.supplier_country and entry_data.supplier_country != "BG":
-            try:
-                country_code = entry_data.supplier_country
-                vat_number = entry_data.supplier_vat[2:]  # Remove country prefix
-                
-                vies_result = self.vies_service.validate_vat_number(
-                    country_code=country_code,
-                    vat_number=vat_number,
-                    requester_country_code="BG",
-                    requester_vat=company.vat_number
-                )
+            return entry_data.supplier_country, entry_data.supplier_vat[2:]  # Remove country prefix
+        return None
+        
+    def _validate_supplier_vies(
+        self,
+        entry_data: EnhancedPurchaseEntryCreate,
+        company: EnhancedCompany,
+        vies_results: Optional[Dict[Tuple[str, str], Optional[VATValidationResult]]] = None
+    ) -> Dict[str, Any]:
+        """Validate an EU supplier VAT number via VIES, returning fields to store on the entry"""
+        vies_data = {}
+        vies_key = self._supplier_vies_key(entry_data)
+        if vies_key:
+            if vies_results is not None and vies_key in vies_results:
+                vies_result = vies_results[vies_key]
+            else:
+                vies_result = _check_vies(self.vies_service, vies_key, company)
                 
+            if vies_result is not None:
                 if vies_result.is_valid:
                     vies_data = {
                         'vies_validated': True,
                         'vies_validation_date': datetime.utcnow(),
                         'vies_company_name': vies_result.company_name or entry_data.supplier_name
                     }
-                    logger.info(f"VIES validation successful for {entry_data.supplier_vat}")
+                    logger.info("VIES validation successful for %s", entry_data.supplier_vat)
                 else:
-                    logger.warning(f"VIES validation failed for {entry_data.supplier_vat}: {vies_result.error_message}")
-                    
-            except Exception as e:
-                logger.error(f"VIES validation error: {str(e)}")
+                    logger.warning("VIES validation failed for %s: %s", entry_data.supplier_vat, vies_result.error_message)
                 
-        # Create entry
-        entry_dict = entry_data.dict()
-        entry_dict.update(vies_data)
-        entry_dict['company_id'] = company.id
-        
-        db_entry = EnhancedPurchaseEntry(**entry_dict)
-        self.db.add(db_entry)
-        self.db.commit()
-        self.db.refresh(db_entry)
-        
-        logger.info(f"Created purchase entry type {entry_data.document_type.value} for company {company_uic}")
-        return db_entry
+        return vies_data
         
     def get_purchases(self, company_uic: str, period: str, document_type: Optional[int] = None) -> List[EnhancedPurchaseEntry]:
         """Get purchase entries with optional document type filter"""
-        company = self.db.query(EnhancedCompany).filter(
-            EnhancedCompany.uic == company_uic
-        ).first()
-        if not company:
-            raise ValueError(f"Company with UIC {company_uic} not found")
-            
+        company = get_company_or_raise(self.db, company_uic)
+        return self.get_purchases_for_company(company.id, period, document_type)
+        
+    def get_purchases_for_company(self, company_id: int, period: str, document_type: Optional[int] = None) -> List[EnhancedPurchaseEntry]:
+        """Get purchase entries for an already resolved company"""
         query = self.db.query(EnhancedPurchaseEntry).filter(
             and_(
-                EnhancedPurchaseEntry.company_id == company.id,
+                EnhancedPurchaseEntry.company_id == company_id,
                 EnhancedPurchaseEntry.period == period
             )
         )
@@ -146,13 +260,17 @@ class EnhancedPurchaseService:
             
         return query.all()
         
+    def calculate_creditable_vat_for_company(self, company_id: int, period: str) -> Decimal:
+        """Sum purchase VAT less credit VAT, skipping entries excluded from tax credit"""
+        return self.db.query(CREDITABLE_PURCHASE_VAT_SUM).filter(
+            EnhancedPurchaseEntry.company_id == company_id,
+            EnhancedPurchaseEntry.period == period,
+            CREDIT_ELIGIBLE_PURCHASE
+        ).scalar()
+        
     def get_purchase_summary_by_type(self, company_uic: str, period: str) -> Dict[int, Dict[str, Any]]:
         """Get purchase summary grouped by document type"""
-        company = self.db.query(EnhancedCompany).filter(
-            EnhancedCompany.uic == company_uic
-        ).first()
-        if not company:
-            raise ValueError(f"Company with UIC {company_uic} not found")
+        company = get_company_or_raise(self.db, company_uic)
             
         results = self.db.query(
             EnhancedPurchaseEntry.document_type,
@@ -185,74 +303,112 @@ class EnhancedSalesService:
     
     def __init__(self, db: Session):
         self.db = db
-        self.vies_service = VIESValidationService()
+        self.vies_service = vies_validator  # shared instance, so its result cache outlives the request
         
     def create_sales_entry(self, company_uic: str, entry_data: EnhancedSalesEntryCreate) -> EnhancedSalesEntry:
         """Create sales entry with field mapping validation"""
         
         # Get company
-        company = self.db.query(EnhancedCompany).filter(
-            EnhancedCompany.uic == company_uic
-        ).first()
-        if not company:
-            raise ValueError(f"Company with UIC {company_uic} not found")
+        company = get_company_or_raise(self.db, company_uic)
             
-        # Validate document type specific requirements
+        # Validate document type specific requirements (one dict serves validation and the insert)
+        entry_dict = entry_data.dict()
         validation_errors = DocumentTypeValidator.validate_sales_document_type(
-            entry_data.document_type.value, entry_data.dict()
+            entry_data.document_type.value, entry_dict
         )
         if validation_errors:
             raise ValueError(f"Validation errors: {', '.join(validation_errors)}")
             
-        # Auto-validate EU VAT numbers if present
-        vies_data = {}
-        if entry_data.customer_vat and entry_data.customer_country and entry_data.customer_country != "BG":
-            try:
-                country_code = entry_data.customer_country
-                vat_number = entry_data.customer_vat[2:]  # Remove country prefix
-                
-                vies_result = self.vies_service.validate_vat_number(
-                    country_code=country_code,
-                    vat_number=vat_number,
-                    requester_country_code="BG",
-                    requester_vat=company.vat_number
-                )
-                
-                if vies_result.is_valid:
-                    vies_data = {
-                        'vies_validated': True,
-                        'vies_validation_date': datetime.utcnow(),
-                        'vies_company_name': vies_result.company_name or entry_data.customer_name
-                    }
-                    logger.info(f"VIES validation successful for {entry_data.customer_vat}")
-                    
-            except Exception as e:
-                logger.error(f"VIES validation error: {str(e)}")
-                
         # Create entry with field mapping
-        entry_dict = entry_data.dict()
-        entry_dict.update(vies_data)
+        entry_dict.update(self._validate_customer_vies(entry_data, company))
         entry_dict['company_id'] = company.id
         
-        db_entry = EnhancedSalesEntry(**entry_dict)
-        self.db.add(db_entry)
+        # RETURNING hydrates the new row (id and defaults) in the INSERT round trip
+        db_entry = self.db.scalars(
+            insert(EnhancedSalesEntry).returning(EnhancedSalesEntry), [entry_dict]
+        ).one()
+        self._add_to_field_totals(company.id, [db_entry])
         self.db.commit()
-        self.db.refresh(db_entry)
         
-        logger.info(f"Created sales entry type {entry_data.document_type.value} for company {company_uic}")
+        logger.info("Created sales entry type %s for company %s", entry_data.document_type.value, company_uic)
         return db_entry
         
+    def create_many(self, company_uic: str, entries: List[EnhancedSalesEntryCreate]) -> List[EnhancedSalesEntry]:
+        """Create several sales entries in a single transaction"""
+        company = get_company_or_raise(self.db, company_uic)
+            
+        # Validate everything up front so the batch is all-or-nothing
+        rows = []
+        for idx, entry_data in enumerate(entries):
+            entry_dict = entry_data.dict()
+            validation_errors = DocumentTypeValidator.validate_sales_document_type(
+                entry_data.document_type.value, entry_dict
+            )
+            if validation_errors:
+                raise ValueError(f"Entry {idx + 1}: Validation errors: {', '.join(validation_errors)}")
+            rows.append(entry_dict)
+            
+        # One VIES check per distinct customer, then stamp every entry
+        vies_keys = {key for key in map(self._customer_vies_key, entries) if key}
+        vies_results = _check_vies_many(self.vies_service, vies_keys, company)
+        for entry_dict, entry_data in zip(rows, entries):
+            entry_dict.update(self._validate_customer_vies(entry_data, company, vies_results))
+            entry_dict['company_id'] = company.id
+            
+        if not rows:
+            return []
+            
+        db_entries = self.db.scalars(
+            insert(EnhancedSalesEntry).returning(EnhancedSalesEntry), rows
+        ).all()
+        self._add_to_field_totals(company.id, db_entries)
+        self.db.commit()
+        
+        logger.info("Created %s sales entries for company %s", len(db_entries), company_uic)
+        return db_entries
+        
+    @staticmethod
+    def _customer_vies_key(entry_data: EnhancedSalesEntryCreate) -> Optional[Tuple[str, str]]:
+        """(country_code, vat_number) to check for an EU customer, None otherwise"""
+        if entry_data.customer_vat and entry_data.customer_country and entry_data.customer_country != "BG":
+            return entry_data.customer_country, entry_data.customer_vat[2:]  # Remove country prefix
+        return None
+        
+    def _validate_customer_vies(
+        self,
+        entry_data: EnhancedSalesEntryCreate,
+        company: EnhancedCompany,
+        vies_results: Optional[Dict[Tuple[str, str], Optional[VATValidationResult]]] = None
+    ) -> Dict[str, Any]:
+        """Validate an EU customer VAT number via VIES, returning fields to store on the entry"""
+        vies_data = {}
+        vies_key = self._customer_vies_key(entry_data)
+        if vies_key:
+            if vies_results is not None and vies_key in vies_results:
+                vies_result = vies_results[vies_key]
+            else:
+                vies_result = _check_vies(self.vies_service, vies_key, company)
+                
+            if vies_result is not None and vies_result.is_valid:
+                vies_data = {
+                    'vies_validated': True,
+                    'vies_validation_date': datetime.utcnow(),
+                    'vies_company_name': vies_result.company_name or entry_data.customer_name
+                }
+                logger.info("VIES validation successful for %s", entry_data.customer_vat)
+                
+        return vies_data
+        
     def get_sales(self, company_uic: str, period: str, document_type: Optional[int] = None) -> List[EnhancedSalesEntry]:
         """Get sales entries with optional document type filter"""
-        company = self.db.query(EnhancedCompany).filter(
-            EnhancedCompany.uic == company_uic
-        ).first()
-        if not company:
-            raise ValueError(f"Company with UIC {company_uic} not found")
-            
+        company = get_company_or_raise(self.db, company_uic)
+        return self.get_sales_for_company(company.id, period, document_type)
+        
+    def get_sales_for_company(self, company_id: int, period: str, document_type: Optional[int] = None) -> List[EnhancedSalesEntry]:
+        """Get sales entries for an already resolved company"""
         query = self.db.query(EnhancedSalesEntry).filter(
             and_(
-                EnhancedSalesEntry.company_id == company.id,
+                EnhancedSalesEntry.company_id == company_id,
                 EnhancedSalesEntry.period == period
             )
         )
@@ -264,26 +420,86 @@ class EnhancedSalesService:
         
     def calculate_field_totals(self, company_uic: str, period: str) -> Dict[str, Decimal]:
         """Calculate totals for all declaration fields (9-25)"""
-        company = self.db.query(EnhancedCompany).filter(
-            EnhancedCompany.uic == company_uic
-        ).first()
-        if not company:
-            raise ValueError(f"Company with UIC {company_uic} not found")
-            
-        entries = self.db.query(EnhancedSalesEntry).filter(
-            and_(
-                EnhancedSalesEntry.company_id == company.id,
-                EnhancedSalesEntry.period == period
-            )
-        ).all()
+        company = get_company_or_raise(self.db, company_uic)
+        return self.calculate_field_totals_for_company(company.id, period)
+        
+    def calculate_field_totals_for_company(self, company_id: int, period: str,
+                                           use_materialized: bool = True) -> Dict[str, Decimal]:
+        """Calculate declaration field totals (9-25) for an already resolved company"""
+        # The materialized row is maintained by every entry insert; it is used
+        # only while the journal's count/max(id) (answered from the
+        # (company_id, period) index) still match the rows folded into it
+        if use_materialized:
+            materialized = self.db.get(SalesFieldTotals, (company_id, period))
+            if materialized is not None and (materialized.entry_count, materialized.last_entry_id) == \
+                    self._journal_fingerprint(company_id, period):
+                return {field_name: getattr(materialized, field_name) for field_name in SALES_FIELD_NAMES}
+        return self._aggregate_field_totals(company_id, period)
+        
+    def _journal_fingerprint(self, company_id: int, period: str) -> Tuple[int, int]:
+        """(count, max id) of the period's journal entries"""
+        entry_count, last_entry_id = self.db.query(
+            func.count(EnhancedSalesEntry.id),
+            func.coalesce(func.max(EnhancedSalesEntry.id), 0)
+        ).filter(
+            EnhancedSalesEntry.company_id == company_id,
+            EnhancedSalesEntry.period == period
+        ).one()
+        return entry_count, last_entry_id
+        
+    def _aggregate_field_totals(self, company_id: int, period: str) -> Dict[str, Decimal]:
+        """Sum fields 9-25 over the journal in one aggregate row"""
+        row = self.db.query(*SALES_FIELD_SUMS).filter(
+            EnhancedSalesEntry.company_id == company_id,
+            EnhancedSalesEntry.period == period
+        ).one()
+        return {
+            field_name: value if value is not None else Decimal('0.00')
+            for field_name, value in row._mapping.items()
+        }
         
-        field_totals = {}
-        for field_num in range(9, 26):  # Fields 9-25
-            field_name = f'field_{field_num:02d}'
-            total = sum(getattr(entry, field_name, Decimal('0.00')) or Decimal('0.00') for entry in entries)
-            field_totals[field_name] = total
+    def _add_to_field_totals(self, company_id: int, db_entries: List[EnhancedSalesEntry]):
+        """Add newly inserted entries to the materialized totals (same transaction as the insert)"""
+        deltas: Dict[str, Dict[str, Any]] = {}
+        for entry in db_entries:
+            delta = deltas.get(entry.period)
+            if delta is None:
+                delta = deltas[entry.period] = dict.fromkeys(SALES_FIELD_NAMES, Decimal('0.00'))
+                delta['entry_count'] = 0
+                delta['last_entry_id'] = 0
+            for field_name in SALES_FIELD_NAMES:
+                delta[field_name] += getattr(entry, field_name) or 0
+            delta['entry_count'] += 1
+            delta['last_entry_id'] = max(delta['last_entry_id'], entry.id)
             
-        return field_totals
+        for period, delta in deltas.items():
+            # field_NN = field_NN + :delta, so concurrent inserts compose
+            values = {
+                field_name: func.coalesce(getattr(SalesFieldTotals, field_name), 0) + delta[field_name]
+                for field_name in SALES_FIELD_NAMES
+            }
+            values['entry_count'] = SalesFieldTotals.entry_count + delta['entry_count']
+            values['last_entry_id'] = case(
+                (SalesFieldTotals.last_entry_id < delta['last_entry_id'], delta['last_entry_id']),
+                else_=SalesFieldTotals.last_entry_id
+            )
+            totals_key = and_(SalesFieldTotals.company_id == company_id, SalesFieldTotals.period == period)
+            if self.db.execute(update(SalesFieldTotals).where(totals_key).values(values)).rowcount:
+                continue
+                
+            # No row yet - seed it from the journal, which already includes the new entries
+            entry_count, last_entry_id = self._journal_fingerprint(company_id, period)
+            field_totals = self._aggregate_field_totals(company_id, period)
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(insert(SalesFieldTotals).values(
+                        company_id=company_id, period=period,
+                        entry_count=entry_count, last_entry_id=last_entry_id,
+                        **field_totals
+                    ))
+            except IntegrityError:
+                # A concurrent insert seeded it first - add this batch on top
+                self.db.execute(update(SalesFieldTotals).where(totals_key).values(values))
 
 class EnhancedVATDeclarationService:
     """Enhanced VAT declaration service with full field support"""
@@ -297,37 +513,90 @@ class EnhancedVATDeclarationService:
         """Generate VAT declaration with automatic field calculations"""
         
         # Get company
-        company = self.db.query(EnhancedCompany).filter(
-            EnhancedCompany.uic == company_uic
-        ).first()
-        if not company:
-            raise ValueError(f"Company with UIC {company_uic} not found")
+        company = get_company_or_raise(self.db, company_uic)
             
         # Check if declaration already exists
-        existing = self.db.query(EnhancedVATDeclaration).filter(
-            and_(
-                EnhancedVATDeclaration.company_id == company.id,
-                EnhancedVATDeclaration.period == period
-            )
-        ).first()
-        
-        if existing:
+        if self.db.query(exists().where(
+            EnhancedVATDeclaration.company_id == company.id,
+            EnhancedVATDeclaration.period == period
+        )).scalar():
             raise ValueError(f"Declaration for period {period} already exists")
             
-        # Calculate sales field totals
-        sales_totals = self.sales_service.calculate_field_totals(company_uic, period)
+        # Calculate sales field totals from the journal itself, not the materialized row
+        sales_totals = self.sales_service.calculate_field_totals_for_company(
+            company.id, period, use_materialized=False
+        )
         
         # Calculate purchase totals
-        purchase_entries = self.purchase_service.get_purchases(company_uic, period)
-        total_purchase_vat = sum(
-            (entry.vat_amount or Decimal('0.00')) - (entry.credit_vat or Decimal('0.00'))
-            for entry in purchase_entries
-            if not entry.tax_credit_excluded
+        total_purchase_vat = self.purchase_service.calculate_creditable_vat_for_company(company.id, period)
+        
+        # Create declaration
+        db_declaration = EnhancedVATDeclaration(
+            **self._declaration_data(company.id, period, sales_totals, total_purchase_vat)
         )
+        self.db.add(db_declaration)
+        self.db.commit()
+        self.db.refresh(db_declaration)
+        
+        logger.info("Generated VAT declaration for company %s, period %s", company_uic, period)
+        return db_declaration
+        
+    def generate_declarations_bulk(self, periods: List[str]) -> List[EnhancedVATDeclaration]:
+        """Generate declarations for every company with journal entries in the given periods"""
+        # Two grouped aggregates cover all companies and periods at once
+        sales_rows = self.db.query(
+            EnhancedSalesEntry.company_id, EnhancedSalesEntry.period, *SALES_FIELD_SUMS
+        ).filter(
+            EnhancedSalesEntry.period.in_(periods)
+        ).group_by(EnhancedSalesEntry.company_id, EnhancedSalesEntry.period).all()
+        purchase_vat = {
+            (row.company_id, row.period): row.total_purchase_vat
+            for row in self.db.query(
+                EnhancedPurchaseEntry.company_id,
+                EnhancedPurchaseEntry.period,
+                CREDITABLE_PURCHASE_VAT_SUM.label('total_purchase_vat')
+            ).filter(
+                EnhancedPurchaseEntry.period.in_(periods),
+                CREDIT_ELIGIBLE_PURCHASE
+            ).group_by(EnhancedPurchaseEntry.company_id, EnhancedPurchaseEntry.period)
+        }
+        sales_totals = {
+            (row.company_id, row.period): {
+                field_name: getattr(row, field_name) or Decimal('0.00') for field_name in SALES_FIELD_NAMES
+            }
+            for row in sales_rows
+        }
+        
+        # Existing declarations are left untouched
+        existing = set(self.db.query(
+            EnhancedVATDeclaration.company_id, EnhancedVATDeclaration.period
+        ).filter(EnhancedVATDeclaration.period.in_(periods)).all())
+        zero_totals = dict.fromkeys(SALES_FIELD_NAMES, Decimal('0.00'))
+        rows = [
+            self._declaration_data(
+                company_id, period,
+                sales_totals.get((company_id, period), zero_totals),
+                purchase_vat.get((company_id, period), Decimal('0.00'))
+            )
+            for company_id, period in sorted((sales_totals.keys() | purchase_vat.keys()) - existing)
+        ]
+        if not rows:
+            return []
+            
+        db_declarations = self.db.scalars(
+            insert(EnhancedVATDeclaration).returning(EnhancedVATDeclaration), rows
+        ).all()
+        self.db.commit()
+        
+        logger.info("Generated %s VAT declarations for periods %s", len(db_declarations), ", ".join(periods))
+        return db_declarations
         
-        # Create declaration with calculated fields
+    @staticmethod
+    def _declaration_data(company_id: int, period: str, sales_totals: Dict[str, Decimal],
+                          total_purchase_vat: Decimal) -> Dict[str, Any]:
+        """Declaration column values calculated from sales field totals and creditable purchase VAT"""
         declaration_data = {
-            'company_id': company.id,
+            'company_id': company_id,
             'period': period,
             'calculation_method': 'AUTOMATIC',
             'status': 'CALCULATED'
@@ -340,40 +609,25 @@ class EnhancedVATDeclarationService:
         declaration_data['field_50'] = sales_totals.get('field_10', Decimal('0.00'))  # Sales VAT
         declaration_data['field_60'] = total_purchase_vat  # Purchase VAT
         
-        # Calculate final amounts (fields 70-82)
-        sales_vat = declaration_data['field_50']
-        purchase_vat = declaration_data['field_60']
-        
-        if sales_vat >= purchase_vat:
-            # VAT to pay
-            declaration_data['field_70'] = sales_vat - purchase_vat
-            declaration_data['field_81'] = declaration_data['field_70']
-            declaration_data['payment_due'] = declaration_data['field_70']
-        else:
-            # VAT refund
-            declaration_data['field_71'] = purchase_vat - sales_vat
-            declaration_data['field_82'] = declaration_data['field_71']
-            declaration_data['refund_due'] = declaration_data['field_71']
+        # Calculate final amounts (fields 70-82) - exactly one side of the
+        # difference is positive: VAT to pay (70/81) or VAT refund (71/82)
+        vat_difference = declaration_data['field_50'] - declaration_data['field_60']
+        vat_to_pay = max(vat_difference, Decimal('0.00'))
+        vat_refund = max(-vat_difference, Decimal('0.00'))
+        declaration_data.update({
+            'field_70': vat_to_pay,
+            'field_81': vat_to_pay,
+            'payment_due': vat_to_pay,
+            'field_71': vat_refund,
+            'field_82': vat_refund,
+            'refund_due': vat_refund,
+        })
             
         # Set payment deadline (14th of following month)
-        year = int(period[:4])
-        month = int(period[4:6])
-        if month == 12:
-            deadline_year = year + 1
-            deadline_month = 1
-        else:
-            deadline_year = year
-            deadline_month = month + 1
-        declaration_data['payment_deadline'] = datetime(deadline_year, deadline_month, 14)
-        
-        # Create declaration
-        db_declaration = EnhancedVATDeclaration(**declaration_data)
-        self.db.add(db_declaration)
-        self.db.commit()
-        self.db.refresh(db_declaration)
+        year, month, _ = _parse_period(period)
+        declaration_data['payment_deadline'] = datetime(year, month, 14) + relativedelta(months=1)
         
-        logger.info(f"Generated VAT declaration for company {company_uic}, period {period}")
-        return db_declaration
+        return declaration_data
         
     def validate_declaration(self, declaration_id: int) -> List[str]:
         """Validate declaration according to NRA rules"""
@@ -414,53 +668,61 @@ class EnhancedVIESService:
         """Generate VIES report for EU transactions"""
         
         # Get company
-        company = self.db.query(EnhancedCompany).filter(
-            EnhancedCompany.uic == company_uic
-        ).first()
-        if not company:
-            raise ValueError(f"Company with UIC {company_uic} not found")
+        company = get_company_or_raise(self.db, company_uic)
             
         # Get EU sales entries
-        eu_sales = self.db.query(EnhancedSalesEntry).filter(
-            and_(
-                EnhancedSalesEntry.company_id == company.id,
-                EnhancedSalesEntry.period == period,
-                EnhancedSalesEntry.document_type.in_([
-                    SalesDocumentType.EU_SALES.value,
-                    SalesDocumentType.TRIANGULAR_SALES.value,
-                    SalesDocumentType.DISTANCE_SELLING.value
-                ])
-            )
-        ).all()
-        
-        # Calculate totals
-        total_eu_sales = sum(entry.field_13 or Decimal('0.00') for entry in eu_sales)
-        total_triangular = sum(
-            entry.field_13 or Decimal('0.00') for entry in eu_sales
-            if entry.document_type == SalesDocumentType.TRIANGULAR_SALES.value
+        eu_sales_filter = and_(
+            EnhancedSalesEntry.company_id == company.id,
+            EnhancedSalesEntry.period == period,
+            EnhancedSalesEntry.document_type.in_(EU_SALES_DOCUMENT_TYPES)
         )
-        
-        # Group by customer
-        eu_customers = {}
-        for entry in eu_sales:
-            if entry.customer_vat and entry.customer_country:
-                key = f"{entry.customer_country}_{entry.customer_vat}"
-                if key not in eu_customers:
-                    eu_customers[key] = {
-                        'country_code': entry.customer_country,
-                        'vat_number': entry.customer_vat,
-                        'company_name': entry.customer_name or entry.vies_company_name,
-                        'total_amount': Decimal('0.00'),
-                        'transaction_count': 0
-                    }
-                eu_customers[key]['total_amount'] += entry.field_13 or Decimal('0.00')
-                eu_customers[key]['transaction_count'] += 1
+        # Calculate totals in SQL (all EU sales and the triangular subset)
+        totals = self.db.query(
+            func.sum(EnhancedSalesEntry.field_13).label('total_eu_sales'),
+            func.sum(case(
+                (EnhancedSalesEntry.document_type == SalesDocumentType.TRIANGULAR_SALES.value,
+                 EnhancedSalesEntry.field_13)
+            )).label('total_triangular')
+        ).filter(eu_sales_filter).one()
+        total_eu_sales = totals.total_eu_sales or Decimal('0.00')
+        total_triangular = totals.total_triangular or Decimal('0.00')
+        
+        # Group by customer in SQL - only the per-customer rows come back,
+        # in order of each customer's first entry
+        customer_rows = self.db.query(
+            EnhancedSalesEntry.customer_country,
+            EnhancedSalesEntry.customer_vat,
+            func.max(func.coalesce(
+                func.nullif(EnhancedSalesEntry.customer_name, ''), EnhancedSalesEntry.vies_company_name
+            )).label('company_name'),
+            func.coalesce(func.sum(EnhancedSalesEntry.field_13), 0, type_=Money).label('total_amount'),
+            func.count(EnhancedSalesEntry.id).label('transaction_count')
+        ).filter(
+            eu_sales_filter,
+            EnhancedSalesEntry.customer_vat.isnot(None),
+            EnhancedSalesEntry.customer_vat != '',
+            EnhancedSalesEntry.customer_country.isnot(None),
+            EnhancedSalesEntry.customer_country != ''
+        ).group_by(
+            EnhancedSalesEntry.customer_country, EnhancedSalesEntry.customer_vat
+        ).order_by(func.min(EnhancedSalesEntry.id)).all()
+        
+        eu_customers = [
+            {
+                'country_code': row.customer_country,
+                'vat_number': row.customer_vat,
+                'company_name': row.company_name,
+                'total_amount': float(row.total_amount),  # JSON column
+                'transaction_count': row.transaction_count
+            }
+            for row in customer_rows
+        ]
                 
         # Create VIES report
         report_data = {
             'company_id': company.id,
             'period': period,
-            'eu_customers': list(eu_customers.values()),
+            'eu_customers': eu_customers,
             'total_eu_sales': total_eu_sales,
             'total_triangular_ops': total_triangular
         }
@@ -470,7 +732,7 @@ class EnhancedVIESService:
         self.db.commit()
         self.db.refresh(db_report)
         
-        logger.info(f"Generated VIES report for company {company_uic}, period {period}")
+        logger.info("Generated VIES report for company %s, period %s", company_uic, period)
         return db_report
 
 class DocumentTypeMappingService:
@@ -522,6 +784,49 @@ class DocumentTypeMappingService:
         self.db.commit()
         logger.info("Initialized default document type mappings")
 
+# Declaration field columns (field_01 ... field_82) in declaration order
+DECLARATION_FIELD_COLUMNS = [
+    column.name for column in EnhancedVATDeclaration.__table__.columns
+    if column.name.startswith("field_")
+]
+
+# Journal columns written as <Entry> children in the NAP export, keyed by XML tag
+PURCHASE_EXPORT_COLUMNS = {
+    "DocumentType": EnhancedPurchaseEntry.document_type,
+    "DocumentNumber": EnhancedPurchaseEntry.document_number,
+    "DocumentDate": EnhancedPurchaseEntry.document_date,
+    "SupplierName": EnhancedPurchaseEntry.supplier_name,
+    "SupplierVAT": EnhancedPurchaseEntry.supplier_vat,
+    "TaxBase": EnhancedPurchaseEntry.tax_base,
+    "VATAmount": EnhancedPurchaseEntry.vat_amount,
+    "CreditVAT": EnhancedPurchaseEntry.credit_vat,
+}
+SALES_EXPORT_COLUMNS = {
+    "DocumentType": EnhancedSalesEntry.document_type,
+    "DocumentNumber": EnhancedSalesEntry.document_number,
+    "DocumentDate": EnhancedSalesEntry.document_date,
+    "CustomerName": EnhancedSalesEntry.customer_name,
+    "CustomerVAT": EnhancedSalesEntry.customer_vat,
+    "TaxBase20": EnhancedSalesEntry.tax_base_20,
+    "VAT20": EnhancedSalesEntry.vat_20,
+    "TotalAmount": EnhancedSalesEntry.total_amount,
+}
+
+# Journal rows fetched per round trip while streaming an export
+EXPORT_BATCH_SIZE = 500
+
+def _xml_text(value: Any) -> str:
+    """Format a column value for XML text (dates as YYYY-MM-DD)"""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+def _xml_element(tag: str, value: Any) -> str:
+    """Serialize a single text element"""
+    element = etree.Element(tag)
+    element.text = _xml_text(value)
+    return etree.tostring(element, encoding="unicode")
+
 class ExportService:
     """Service for exporting data to NAP and other formats"""
     
@@ -531,13 +836,43 @@ class ExportService:
     def export_vat_declaration(self, declaration_id: int, export_format: str = "XML") -> ExportLog:
         """Export VAT declaration to NAP format"""
         
-        declaration = self.db.query(EnhancedVATDeclaration).filter(
+        # The company (many-to-one) is joined into the same SELECT for the XML header
+        declaration = self.db.query(EnhancedVATDeclaration).options(
+            joinedload(EnhancedVATDeclaration.company)
+        ).filter(
             EnhancedVATDeclaration.id == declaration_id
         ).first()
         
         if not declaration:
             raise ValueError(f"Declaration {declaration_id} not found")
             
+        export_log = self._export_declaration(declaration, export_format)
+        self.db.add(export_log)
+        self.db.commit()
+        self.db.refresh(export_log)
+        
+        return export_log
+        
+    def export_vat_declarations_bulk(self, declaration_ids: List[int], export_format: str = "XML") -> List[ExportLog]:
+        """Export several VAT declarations with one query and one commit"""
+        declarations = self.db.query(EnhancedVATDeclaration).options(
+            joinedload(EnhancedVATDeclaration.company)
+        ).filter(
+            EnhancedVATDeclaration.id.in_(declaration_ids)
+        ).all()
+        
+        missing = set(declaration_ids) - {declaration.id for declaration in declarations}
+        if missing:
+            raise ValueError(f"Declarations not found: {', '.join(map(str, sorted(missing)))}")
+            
+        export_logs = [self._export_declaration(declaration, export_format) for declaration in declarations]
+        self.db.add_all(export_logs)
+        self.db.commit()
+        
+        return export_logs
+        
+    def _export_declaration(self, declaration: EnhancedVATDeclaration, export_format: str) -> ExportLog:
+        """Generate the export for a loaded declaration and return its (unsaved) log entry"""
         # Create export log entry
         export_log = ExportLog(
             company_id=declaration.company_id,
@@ -551,41 +886,50 @@ class ExportService:
             # Generate export file (implementation depends on NAP specifications)
             file_name = f"vat_declaration_{declaration.company.uic}_{declaration.period}.xml"
             
-            # This would contain the actual NAP XML generation logic
-            export_data = self._generate_nap_xml(declaration)
+            file_path = os.path.abspath(os.path.join(EXPORT_DIR, file_name))
+            os.makedirs(EXPORT_DIR, exist_ok=True)
             
-            # Save file (implementation specific)
-            file_path = f"/exports/{file_name}"
-            # with open(file_path, 'w') as f:
-            #     f.write(export_data)
+            self._write_nap_xml(declaration, file_path)
             
             export_log.file_name = file_name
             export_log.file_path = file_path
+            export_log.file_size = os.path.getsize(file_path)
             export_log.export_status = "SUCCESS"
             export_log.completed_at = datetime.utcnow()
             
         except Exception as e:
             export_log.export_status = "FAILED"
             export_log.error_message = str(e)
-            logger.error(f"Export failed: {str(e)}")
+            logger.error("Export failed: %s", e)
             
-        self.db.add(export_log)
-        self.db.commit()
-        self.db.refresh(export_log)
-        
         return export_log
         
-    def _generate_nap_xml(self, declaration: EnhancedVATDeclaration) -> str:
-        """Generate NAP-compatible XML (placeholder implementation)"""
-        # This would contain the actual XML generation according to NAP specifications
-        xml_template = f"""
-        <?xml version="1.0" encoding="UTF-8"?>
-        <VATDeclaration>
-            <CompanyUIC>{declaration.company.uic}</CompanyUIC>
-            <Period>{declaration.period}</Period>
-            <Field50>{declaration.field_50}</Field50>
-            <Field60>{declaration.field_60}</Field60>
-            <!-- Add all other fields -->
-        </VATDeclaration>
-        """
-        return xml_template
\ No newline at end of file
+    def _write_nap_xml(self, declaration: EnhancedVATDeclaration, file_path: str):
+        """Stream NAP-compatible XML to file_path: declaration fields, then one <Entry> per journal row"""
+        with open(file_path, "w", encoding="utf-8") as xml_file:
+            xml_file.write('<?xml version="1.0" encoding="UTF-8"?>\n<VATDeclaration>')
+            xml_file.write(_xml_element("CompanyUIC", declaration.company.uic))
+            xml_file.write(_xml_element("Period", declaration.period))
+            for column_name in DECLARATION_FIELD_COLUMNS:
+                value = getattr(declaration, column_name)
+                xml_file.write(_xml_element(f"Field{column_name[6:]}", value if value is not None else Decimal('0.00')))
+                
+            # Journal rows are fetched in batches and serialized one <Entry> at a
+            # time, so memory stays flat however many entries the period has
+            for section, model, columns in (
+                ("PurchaseJournal", EnhancedPurchaseEntry, PURCHASE_EXPORT_COLUMNS),
+                ("SalesJournal", EnhancedSalesEntry, SALES_EXPORT_COLUMNS),
+            ):
+                xml_file.write(f"<{section}>")
+                rows = self.db.query(*columns.values()).filter(
+                    model.company_id == declaration.company_id,
+                    model.period == declaration.period
+                ).order_by(model.id).yield_per(EXPORT_BATCH_SIZE)
+                for row in rows:
+                    entry = etree.Element("Entry")
+                    for tag, value in zip(columns, row):
+                        if value is not None:
+                            etree.SubElement(entry, tag).text = _xml_text(value)
+                    xml_file.write(etree.tostring(entry, encoding="unicode"))
+                xml_file.write(f"</{section}>")
+            xml_file.write("</VATDeclaration>\n")
\ No newline at end of file
@@ -5,16 +5,55 @@ Handles Excel/JSON imports from PaperlessAI exports for automatic
 journal entry creation in the Bulgarian VAT system.
 """
 
+import numpy as np
 import pandas as pd
 import json
-from typing import Dict, List, Optional, Tuple, Any
-from decimal import Decimal
+from html import escape
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+from itertools import islice
+from decimal import Decimal, InvalidOperation
 from datetime import datetime
 import re
 
+try:
+    import orjson
+except ImportError:  # stdlib json parses the same documents, just slower
+    orjson = None
+
+try:
+    import python_calamine  # enables pandas' Rust-based 'calamine' reader
+    EXCEL_ENGINE = 'calamine'
+except ImportError:  # let pandas pick openpyxl (.xlsx) / xlrd (.xls)
+    EXCEL_ENGINE = None
+
 from models_sync import Company
+from schemas import PurchaseJournalCreate, SalesJournalCreate
 from services_sync import JournalService
 
+# Details sheet each journal type reads alongside the Summary/Sheet1 data sheet
+EXCEL_DETAILS_SHEETS = {
+    'purchase': 'Supplier Details',
+    'sales': 'Customer Details',
+}
+
+_BG_VAT_RE = re.compile(r'^BG\d{9,10}$')
+_PERIOD_RE = re.compile(r'^\d{6}$')
+# Anything but digits, decimal point and minus (currency symbols, spaces, separators)
+_NUMBER_CLEAN_RE = re.compile(r'[^\d.-]')
+
+# One preview table row; every value is HTML-escaped before formatting
+_PREVIEW_ROW_TEMPLATE = (
+    '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td>'
+    '<td class="text-right">{}</td><td class="text-right">{}</td><td class="text-right">{}</td></tr>'
+)
+
+
+def _decimal_to_float(obj: Any) -> float:
+    """orjson default hook: Decimals become floats, anything else is unsupported"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
 
 class VATFileImportService:
     """Service for importing PaperlessAI exports into VAT system"""
@@ -41,9 +80,20 @@ class VATFileImportService:
         Returns:
             tuple: (success, result_data)
         """
+        if journal_type not in EXCEL_DETAILS_SHEETS:
+            return False, {'error': f'Invalid journal type: {journal_type}'}
+        
         try:
-            # Read Excel file with multiple sheets
-            excel_data = pd.read_excel(file_path, sheet_name=None)
+            # Parse only the sheets this journal type uses; other tabs stay unread
+            # (kept as None so the missing-sheet message can still list them)
+            with pd.ExcelFile(file_path, engine=EXCEL_ENGINE) as workbook:
+                sheet_names = workbook.sheet_names
+                data_sheet = 'Summary' if 'Summary' in sheet_names else 'Sheet1'
+                wanted = {data_sheet, EXCEL_DETAILS_SHEETS[journal_type]}
+                excel_data = {
+                    name: workbook.parse(name) if name in wanted else None
+                    for name in sheet_names
+                }
             
             # Process each sheet
             result = {
@@ -57,10 +107,8 @@ class VATFileImportService:
             # Determine which sheet to process based on journal type
             if journal_type == 'purchase':
                 processed_entries, error_messages = self._process_purchase_excel(excel_data, company_uic)
-            elif journal_type == 'sales':
-                processed_entries, error_messages = self._process_sales_excel(excel_data, company_uic)
             else:
-                return False, {'error': f'Invalid journal type: {journal_type}'}
+                processed_entries, error_messages = self._process_sales_excel(excel_data, company_uic)
             
             result['total_records'] = len(processed_entries)
             result['preview_data'] = processed_entries[:10]  # First 10 for preview
@@ -77,7 +125,7 @@ class VATFileImportService:
             return False, {'error': f'Failed to process Excel file: {str(e)}'}
     
     def import_json_file(self, file_path: str, company_uic: str,
-                        journal_type: str = 'purchase') -> Tuple[bool, Dict]:
+                        journal_type: str = 'purchase', include_source: bool = False) -> Tuple[bool, Dict]:
         """
         Import PaperlessAI JSON export into VAT system
         
@@ -85,13 +133,13 @@ class VATFileImportService:
             file_path: Path to JSON file
             company_uic: Target company УИК
             journal_type: 'purchase' or 'sales'
+            include_source: Keep each raw extraction as 'original_extraction'
             
         Returns:
             tuple: (success, result_data)
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
+            json_data = self._load_json(file_path)
             
             result = {
                 'total_records': 0,
@@ -103,14 +151,15 @@ class VATFileImportService:
             
             # Process JSON data
             if journal_type == 'purchase':
-                processed_entries = self._process_purchase_json(json_data, company_uic)
+                processed_entries = self._process_purchase_json(json_data, company_uic, include_source)
             elif journal_type == 'sales':
-                processed_entries = self._process_sales_json(json_data, company_uic)
+                processed_entries = self._process_sales_json(json_data, company_uic, include_source)
             else:
                 return False, {'error': f'Invalid journal type: {journal_type}'}
             
-            result['total_records'] = len(processed_entries)
-            result['preview_data'] = processed_entries[:10]
+            # Only the preview entries are kept; the rest are just counted
+            result['preview_data'] = list(islice(processed_entries, 10))
+            result['total_records'] = len(result['preview_data']) + sum(1 for _ in processed_entries)
             
             # Serialize all decimal values for JSON compatibility
             result = self._serialize_decimals(result)
@@ -135,10 +184,9 @@ class VATFileImportService:
         valid_entries = []
         validation_errors = []
         
-        for idx, entry in enumerate(processed_entries):
-            is_valid, errors = self._validate_vat_entry(entry)
-            
-            if is_valid:
+        entry_errors = self._validate_vat_entries(processed_entries)
+        for idx, (entry, errors) in enumerate(zip(processed_entries, entry_errors)):
+            if not errors:
                 valid_entries.append(entry)
             else:
                 validation_errors.append({
@@ -160,23 +208,28 @@ class VATFileImportService:
             imported_count = 0
             import_errors = []
             
+            # Group by journal and company so each group is inserted in one transaction
+            batches = {}
             for entry in valid_entries:
                 try:
                     if entry['journal_type'] == 'purchase':
-                        self.journal_service.add_purchase_entry(
-                            entry['company_uic'], entry['data']
-                        )
+                        entry_data = PurchaseJournalCreate(**entry['data'])
                     elif entry['journal_type'] == 'sales':
-                        self.journal_service.add_sales_entry(
-                            entry['company_uic'], entry['data']
-                        )
-                    imported_count += 1
-                    
+                        entry_data = SalesJournalCreate(**entry['data'])
+                    else:
+                        raise ValueError(f"Unknown journal type: {entry['journal_type']}")
                 except Exception as e:
                     import_errors.append({
                         'entry': entry,
                         'error': str(e)
                     })
+                    continue
+                
+                batch_key = (entry['journal_type'], entry['company_uic'])
+                batches.setdefault(batch_key, []).append((entry, entry_data))
+            
+            for (journal_type, company_uic), batch in batches.items():
+                imported_count += self._import_batch(journal_type, company_uic, batch, import_errors)
             
             result['imported_count'] = imported_count
             result['import_errors'] = import_errors
@@ -186,6 +239,36 @@ class VATFileImportService:
         
         return len(validation_errors) == 0, result
     
+    def _import_batch(self, journal_type: str, company_uic: str,
+                      batch: List[Tuple[Dict, Any]], import_errors: List[Dict]) -> int:
+        """Insert one journal/company group in a single transaction, retrying row by row if it fails"""
+        if journal_type == 'purchase':
+            add_bulk = self.journal_service.add_purchase_entries_bulk
+            add_entry = self.journal_service.add_purchase_entry
+        else:
+            add_bulk = self.journal_service.add_sales_entries_bulk
+            add_entry = self.journal_service.add_sales_entry
+        
+        try:
+            add_bulk(company_uic, [entry_data for _, entry_data in batch])
+            return len(batch)
+        except Exception:
+            self.journal_service.db.rollback()
+        
+        # Row by row so import_errors names exactly the entries that fail
+        imported_count = 0
+        for entry, entry_data in batch:
+            try:
+                add_entry(company_uic, entry_data)
+                imported_count += 1
+            except Exception as e:
+                self.journal_service.db.rollback()
+                import_errors.append({
+                    'entry': entry,
+                    'error': str(e)
+                })
+        return imported_count
+    
     def _process_purchase_excel(self, excel_data: Dict, company_uic: str) -> Tuple[List[Dict], List[str]]:
         """Process PaperlessAI Excel export for purchase journal entries"""
         processed_entries = []
@@ -205,57 +288,75 @@ class VATFileImportService:
         if not supplier_df.empty:
             error_messages.append(f"✅ Found supplier details sheet with {len(supplier_df)} suppliers")
         
-        for row_idx, row in summary_df.iterrows():
+        # Pull each column once instead of building a Series per row
+        invoice_numbers = self._column(summary_df, 'Invoice Number', '')
+        supplier_names = self._column(summary_df, 'Supplier Name', '')
+        invoice_missing = self._blank_mask(invoice_numbers)
+        supplier_missing = self._blank_mask(supplier_names)
+        subtotals = self._decimal_column(summary_df, 'Subtotal (€)')
+        vats = self._decimal_column(summary_df, 'VAT Amount (€)')
+        totals = self._decimal_column(summary_df, 'Total Due (€)')
+        vat_missing, total_mismatch = self._amount_checks(subtotals, vats, totals)
+        rows = zip(
+            invoice_numbers, supplier_names, subtotals, vats, totals,
+            *self._date_columns(summary_df, 'Invoice Date'),
+            self._column(summary_df, 'Filename', '')
+        )
+        
+        # Invoice number -> VAT ID, built once instead of filtering the sheet per row
+        supplier_vats = self._map_vat(invoice_numbers, self._build_vat_map(supplier_df, 'VAT ID'))
+        
+        for row_idx, (invoice_number, supplier_name, subtotal, vat, total, period, document_date, filename) in enumerate(rows):
             row_num = row_idx + 2  # +2 because Excel is 1-based and has header
             row_errors = []
             
             try:
                 # Check for required fields
-                if pd.isna(row.get('Invoice Number')) or str(row.get('Invoice Number', '')).strip() == '':
+                if invoice_missing[row_idx]:
                     row_errors.append(f"Row {row_num}: Missing invoice number")
                 
-                if pd.isna(row.get('Supplier Name')) or str(row.get('Supplier Name', '')).strip() == '':
+                if supplier_missing[row_idx]:
                     row_errors.append(f"Row {row_num}: Missing supplier name")
                 
                 # Process decimal fields with error tracking
-                tax_base, tax_base_error = self._to_decimal(row.get('Subtotal (€)', 0), 'Subtotal (€)', row_num)
+                tax_base, tax_base_error = subtotal
                 if tax_base_error:
                     row_errors.append(tax_base_error)
                 
-                vat_amount, vat_error = self._to_decimal(row.get('VAT Amount (€)', 0), 'VAT Amount (€)', row_num)
+                vat_amount, vat_error = vat
                 if vat_error:
                     row_errors.append(vat_error)
                 
-                total_amount, total_error = self._to_decimal(row.get('Total Due (€)', 0), 'Total Due (€)', row_num)
+                total_amount, total_error = total
                 if total_error:
                     row_errors.append(total_error)
                 
                 # Map PaperlessAI columns to VAT system fields
                 entry_data = {
-                    'period': self._calculate_period_from_date(row.get('Invoice Date')),
+                    'period': period,
                     'document_type': 1,  # Invoice
-                    'document_number': str(row.get('Invoice Number', '')),
-                    'document_date': self._format_date(row.get('Invoice Date')),
-                    'supplier_name': str(row.get('Supplier Name', '')),
-                    'supplier_vat': self._extract_supplier_vat(row, supplier_df),
+                    'document_number': str(invoice_number),
+                    'document_date': document_date,
+                    'supplier_name': str(supplier_name),
+                    'supplier_vat': supplier_vats[row_idx],
                     'tax_base': tax_base,
                     'vat_amount': vat_amount,
                     'total_amount': total_amount,
-                    'notes': f'Imported from PaperlessAI - {row.get("Filename", "")}'
+                    'notes': f'Imported from PaperlessAI - {filename}'
                 }
                 
                 # Validate business logic
-                if tax_base > 0 and vat_amount == 0:
+                if vat_missing[row_idx]:
                     row_errors.append(f"Row {row_num}: ⚠️ Tax base {tax_base} but no VAT amount")
                 
-                if abs(float(tax_base + vat_amount) - float(total_amount)) > 0.01:
+                if total_mismatch[row_idx]:
                     row_errors.append(f"Row {row_num}: ⚠️ Tax base + VAT ({tax_base + vat_amount}) doesn't equal total ({total_amount})")
                 
                 processed_entries.append({
                     'journal_type': 'purchase',
                     'company_uic': company_uic,
                     'data': entry_data,
-                    'original_row': row.to_dict(),
+                    'source_row': row_num,  # sheet row, as used in the messages
                     'row_errors': row_errors
                 })
                 
@@ -287,61 +388,79 @@ class VATFileImportService:
         if not customer_df.empty:
             error_messages.append(f"✅ Found customer details sheet with {len(customer_df)} customers")
         
-        for row_idx, row in summary_df.iterrows():
+        # Pull each column once instead of building a Series per row
+        invoice_numbers = self._column(summary_df, 'Invoice Number', '')
+        customer_names = self._column(summary_df, 'Customer Name', '')
+        invoice_missing = self._blank_mask(invoice_numbers)
+        customer_missing = self._blank_mask(customer_names)
+        subtotals = self._decimal_column(summary_df, 'Subtotal (€)')
+        vats = self._decimal_column(summary_df, 'VAT Amount (€)')
+        totals = self._decimal_column(summary_df, 'Total Due (€)')
+        vat_missing, total_mismatch = self._amount_checks(subtotals, vats, totals)
+        rows = zip(
+            invoice_numbers, customer_names, subtotals, vats, totals,
+            *self._date_columns(summary_df, 'Invoice Date'),
+            self._column(summary_df, 'Filename', '')
+        )
+        
+        # Invoice number -> company ID (customer details may not carry a VAT ID column)
+        customer_vats = self._map_vat(invoice_numbers, self._build_vat_map(customer_df, 'Company ID'))
+        
+        for row_idx, (invoice_number, customer_name, subtotal, vat, total, period, document_date, filename) in enumerate(rows):
             row_num = row_idx + 2  # +2 because Excel is 1-based and has header
             row_errors = []
             
             try:
                 # Check for required fields
-                if pd.isna(row.get('Invoice Number')) or str(row.get('Invoice Number', '')).strip() == '':
+                if invoice_missing[row_idx]:
                     row_errors.append(f"Row {row_num}: Missing invoice number")
                 
-                if pd.isna(row.get('Customer Name')) or str(row.get('Customer Name', '')).strip() == '':
+                if customer_missing[row_idx]:
                     row_errors.append(f"Row {row_num}: Missing customer name")
                 
                 # Process decimal fields with error tracking
-                tax_base_20, tax_base_error = self._to_decimal(row.get('Subtotal (€)', 0), 'Subtotal (€)', row_num)
+                tax_base_20, tax_base_error = subtotal
                 if tax_base_error:
                     row_errors.append(tax_base_error)
                 
-                vat_20, vat_error = self._to_decimal(row.get('VAT Amount (€)', 0), 'VAT Amount (€)', row_num)
+                vat_20, vat_error = vat
                 if vat_error:
                     row_errors.append(vat_error)
                 
                 tax_base_0, _ = self._to_decimal(0, 'tax_base_0', row_num)
                 tax_base_exempt, _ = self._to_decimal(0, 'tax_base_exempt', row_num)
                 
-                total_amount, total_error = self._to_decimal(row.get('Total Due (€)', 0), 'Total Due (€)', row_num)
+                total_amount, total_error = total
                 if total_error:
                     row_errors.append(total_error)
                 
                 entry_data = {
-                    'period': self._calculate_period_from_date(row.get('Invoice Date')),
+                    'period': period,
                     'document_type': 1,  # Invoice
-                    'document_number': str(row.get('Invoice Number', '')),
-                    'document_date': self._format_date(row.get('Invoice Date')),
-                    'customer_name': str(row.get('Customer Name', '')),
-                    'customer_vat': self._extract_customer_vat(row, customer_df),
+                    'document_number': str(invoice_number),
+                    'document_date': document_date,
+                    'customer_name': str(customer_name),
+                    'customer_vat': customer_vats[row_idx],
                     'tax_base_20': tax_base_20,
                     'vat_20': vat_20,
                     'tax_base_0': tax_base_0,
                     'tax_base_exempt': tax_base_exempt,
                     'total_amount': total_amount,
-                    'notes': f'Imported from PaperlessAI - {row.get("Filename", "")}'
+                    'notes': f'Imported from PaperlessAI - {filename}'
                 }
                 
                 # Validate business logic
-                if tax_base_20 > 0 and vat_20 == 0:
+                if vat_missing[row_idx]:
                     row_errors.append(f"Row {row_num}: ⚠️ Tax base {tax_base_20} but no VAT amount")
                 
-                if abs(float(tax_base_20 + vat_20) - float(total_amount)) > 0.01:
+                if total_mismatch[row_idx]:
                     row_errors.append(f"Row {row_num}: ⚠️ Tax base + VAT ({tax_base_20 + vat_20}) doesn't equal total ({total_amount})")
                 
                 processed_entries.append({
                     'journal_type': 'sales',
                     'company_uic': company_uic,
                     'data': entry_data,
-                    'original_row': row.to_dict(),
+                    'source_row': row_num,  # sheet row, as used in the messages
                     'row_errors': row_errors
                 })
                 
@@ -356,17 +475,32 @@ class VATFileImportService:
         error_messages.append(f"✅ Successfully processed {len(processed_entries)} entries")
         return processed_entries, error_messages
     
-    def _process_purchase_json(self, json_data: Any, company_uic: str) -> List[Dict]:
-        """Process PaperlessAI JSON export for purchase journal entries"""
-        processed_entries = []
+    @staticmethod
+    def _load_json(file_path: str) -> Any:
+        """Parse a JSON export, with orjson when it is installed"""
+        with open(file_path, 'rb') as f:
+            raw = f.read()
         
+        if orjson is not None:
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass  # e.g. NaN literals or huge integers, which only the stdlib parser accepts
+        return json.loads(raw.decode('utf-8'))
+    
+    def _process_purchase_json(self, json_data: Any, company_uic: str,
+                               include_source: bool = False) -> Iterator[Dict]:
+        """Yield purchase journal entries from a PaperlessAI JSON export"""
         # Handle different JSON structures
         if isinstance(json_data, list):
             extractions = json_data
         elif isinstance(json_data, dict):
             extractions = json_data.get('extractions', [json_data])
         else:
-            return []
+            return
+        
+        # Fallback period for extractions without a usable invoice date
+        current_period = self._get_current_period()
         
         for extraction in extractions:
             try:
@@ -375,41 +509,43 @@ class VATFileImportService:
                 financial_summary = extracted_data.get('financial_summary', {})
                 
                 entry_data = {
-                    'period': self._calculate_period_from_date(extracted_data.get('invoice_date')),
+                    'period': self._calculate_period_from_date(extracted_data.get('invoice_date'), current_period),
                     'document_type': 1,
                     'document_number': str(extracted_data.get('invoice_number', '')),
                     'document_date': extracted_data.get('invoice_date'),
                     'supplier_name': supplier_details.get('name', ''),
                     'supplier_vat': supplier_details.get('vat_id', ''),
-                    'tax_base': self._to_decimal(financial_summary.get('subtotal', 0)),
-                    'vat_amount': self._to_decimal(financial_summary.get('vat_amount', 0)),
-                    'total_amount': self._to_decimal(financial_summary.get('total_due', 0)),
+                    'tax_base': self._to_decimal(financial_summary.get('subtotal', 0))[0],
+                    'vat_amount': self._to_decimal(financial_summary.get('vat_amount', 0))[0],
+                    'total_amount': self._to_decimal(financial_summary.get('total_due', 0))[0],
                     'notes': f'Imported from PaperlessAI - {extraction.get("filename", "")}'
                 }
                 
-                processed_entries.append({
+                entry = {
                     'journal_type': 'purchase',
                     'company_uic': company_uic,
-                    'data': entry_data,
-                    'original_extraction': extraction
-                })
+                    'data': entry_data
+                }
+                if include_source:
+                    entry['original_extraction'] = extraction
+                yield entry
                 
             except Exception as e:
                 print(f"Error processing JSON extraction: {e}")
                 continue
-        
-        return processed_entries
     
-    def _process_sales_json(self, json_data: Any, company_uic: str) -> List[Dict]:
-        """Process PaperlessAI JSON export for sales journal entries"""
-        processed_entries = []
-        
+    def _process_sales_json(self, json_data: Any, company_uic: str,
+                            include_source: bool = False) -> Iterator[Dict]:
+        """Yield sales journal entries from a PaperlessAI JSON export"""
         if isinstance(json_data, list):
             extractions = json_data
         elif isinstance(json_data, dict):
             extractions = json_data.get('extractions', [json_data])
         else:
-            return []
+            return
+        
+        # Fallback period for extractions without a usable invoice date
+        current_period = self._get_current_period()
         
         for extraction in extractions:
             try:
@@ -418,131 +554,198 @@ class VATFileImportService:
                 financial_summary = extracted_data.get('financial_summary', {})
                 
                 entry_data = {
-                    'period': self._calculate_period_from_date(extracted_data.get('invoice_date')),
+                    'period': self._calculate_period_from_date(extracted_data.get('invoice_date'), current_period),
                     'document_type': 1,
                     'document_number': str(extracted_data.get('invoice_number', '')),
                     'document_date': extracted_data.get('invoice_date'),
                     'customer_name': customer_details.get('name', ''),
                     'customer_vat': customer_details.get('vat_id', ''),
-                    'tax_base_20': self._to_decimal(financial_summary.get('subtotal', 0)),
-                    'vat_20': self._to_decimal(financial_summary.get('vat_amount', 0)),
-                    'tax_base_0': self._to_decimal(0),
-                    'tax_base_exempt': self._to_decimal(0),
-                    'total_amount': self._to_decimal(financial_summary.get('total_due', 0)),
+                    'tax_base_20': self._to_decimal(financial_summary.get('subtotal', 0))[0],
+                    'vat_20': self._to_decimal(financial_summary.get('vat_amount', 0))[0],
+                    'tax_base_0': self._to_decimal(0)[0],
+                    'tax_base_exempt': self._to_decimal(0)[0],
+                    'total_amount': self._to_decimal(financial_summary.get('total_due', 0))[0],
                     'notes': f'Imported from PaperlessAI - {extraction.get("filename", "")}'
                 }
                 
-                processed_entries.append({
+                entry = {
                     'journal_type': 'sales',
                     'company_uic': company_uic,
-                    'data': entry_data,
-                    'original_extraction': extraction
-                })
+                    'data': entry_data
+                }
+                if include_source:
+                    entry['original_extraction'] = extraction
+                yield entry
                 
             except Exception as e:
                 print(f"Error processing JSON extraction: {e}")
                 continue
-        
-        return processed_entries
     
-    def _validate_vat_entry(self, entry: Dict) -> Tuple[bool, List[str]]:
-        """Validate a VAT journal entry for Bulgarian compliance"""
-        errors = []
-        data = entry.get('data', {})
-        
-        # Required fields validation
-        if not data.get('document_number'):
-            errors.append('Document number is required')
-        
-        if not data.get('document_date'):
-            errors.append('Document date is required')
-        
-        # VAT number validation
-        if entry['journal_type'] == 'purchase':
-            vat_field = 'supplier_vat'
-            name_field = 'supplier_name'
-        else:
-            vat_field = 'customer_vat'
-            name_field = 'customer_name'
-        
-        vat_number = data.get(vat_field)
-        if vat_number and not self._validate_bg_vat_format(vat_number):
-            errors.append(f'Invalid VAT number format: {vat_number}')
+    def _validate_vat_entries(self, entries: List[Dict]) -> List[List[str]]:
+        """Validate VAT journal entries for Bulgarian compliance; returns the errors of each entry"""
+        if not entries:
+            return []
         
-        if not data.get(name_field):
-            errors.append(f'{name_field.replace("_", " ").title()} is required')
+        is_purchase = np.array([entry['journal_type'] == 'purchase' for entry in entries])
+        data = [entry.get('data', {}) for entry in entries]
+        
+        def column(purchase_key: str, sales_key: str) -> np.ndarray:
+            return np.array([
+                values.get(purchase_key if purchase else sales_key)
+                for values, purchase in zip(data, is_purchase)
+            ], dtype=object)
+        
+        def present(values: np.ndarray) -> np.ndarray:
+            return values.astype(bool)  # Python truthiness per element
+        
+        def matches(values: np.ndarray, pattern: re.Pattern) -> np.ndarray:
+            return pd.Series(values, dtype=object).str.match(pattern, na=False).to_numpy(dtype=bool)
+        
+        document_numbers = column('document_number', 'document_number')
+        document_dates = column('document_date', 'document_date')
+        vat_numbers = column('supplier_vat', 'customer_vat')
+        names = column('supplier_name', 'customer_name')
+        tax_bases = column('tax_base', 'tax_base_20')
+        vat_amounts = column('vat_amount', 'vat_20')
+        periods = column('period', 'period')
+        
+        # Each rule as a mask over all entries
+        document_number_missing = ~present(document_numbers)
+        document_date_missing = ~present(document_dates)
+        
+        has_vat_number = present(vat_numbers)
+        vat_clean = pd.Series(vat_numbers, dtype=object).str.replace(' ', '').str.upper().to_numpy(dtype=object)
+        vat_number_invalid = has_vat_number & ~matches(vat_clean, _BG_VAT_RE)
+        
+        name_missing = ~present(names)
+        
+        vat_checked = present(tax_bases) & present(vat_amounts)
+        expected_vat = np.zeros(len(entries))
+        expected_vat[vat_checked] = tax_bases[vat_checked].astype(float) * 0.20
+        vat_difference = np.zeros(len(entries))
+        vat_difference[vat_checked] = vat_amounts[vat_checked].astype(float) - expected_vat[vat_checked]
+        vat_calculation_wrong = vat_checked & (np.abs(vat_difference) > 0.01)
+        
+        has_period = present(periods)
+        period_text = np.array([str(period) for period in periods], dtype=object)
+        period_invalid = has_period & ~matches(period_text, _PERIOD_RE)
+        
+        failing = (document_number_missing | document_date_missing | vat_number_invalid
+                   | name_missing | vat_calculation_wrong | period_invalid)
+        
+        # Messages are only built for entries that broke at least one rule
+        entry_errors = [[] for _ in entries]
+        for idx in np.flatnonzero(failing):
+            errors = entry_errors[idx]
+            if document_number_missing[idx]:
+                errors.append('Document number is required')
+            if document_date_missing[idx]:
+                errors.append('Document date is required')
+            if vat_number_invalid[idx]:
+                errors.append(f'Invalid VAT number format: {vat_numbers[idx]}')
+            if name_missing[idx]:
+                errors.append('Supplier Name is required' if is_purchase[idx] else 'Customer Name is required')
+            if vat_calculation_wrong[idx]:
+                errors.append(f'VAT calculation error: Expected {expected_vat[idx]:.2f}, got {vat_amounts[idx]}')
+            if period_invalid[idx]:
+                errors.append(f'Invalid period format: {periods[idx]} (expected YYYYMM)')
+        
+        return entry_errors
+    
+    @staticmethod
+    def _build_vat_map(details_df: pd.DataFrame, vat_column: str) -> Dict[Any, str]:
+        """Map each invoice number to the first VAT/company ID listed for it in a details sheet"""
+        if details_df.empty or 'Invoice Number' not in details_df.columns:
+            return {}
         
-        # Amount validation
-        if entry['journal_type'] == 'purchase':
-            tax_base = data.get('tax_base', 0)
-            vat_amount = data.get('vat_amount', 0)
+        if vat_column in details_df.columns:
+            vat_ids = details_df[vat_column].to_numpy(dtype=object)
         else:
-            tax_base = data.get('tax_base_20', 0)
-            vat_amount = data.get('vat_20', 0)
-        
-        if tax_base and vat_amount:
-            expected_vat = float(tax_base) * 0.20
-            if abs(float(vat_amount) - expected_vat) > 0.01:
-                errors.append(f'VAT calculation error: Expected {expected_vat:.2f}, got {vat_amount}')
+            vat_ids = np.full(len(details_df), '', dtype=object)
         
-        # Period validation
-        period = data.get('period')
-        if period and not re.match(r'^\d{6}$', str(period)):
-            errors.append(f'Invalid period format: {period} (expected YYYYMM)')
-        
-        return len(errors) == 0, errors
+        vat_map = {}
+        for invoice_number, vat_id in zip(details_df['Invoice Number'].to_numpy(dtype=object), vat_ids):
+            if not pd.isna(invoice_number):
+                vat_map.setdefault(invoice_number, str(vat_id))
+        return vat_map
     
-    def _extract_supplier_vat(self, row: pd.Series, supplier_df: pd.DataFrame) -> str:
-        """Extract supplier VAT from supplier details sheet"""
-        if supplier_df.empty:
-            return ''
-        
-        invoice_number = row.get('Invoice Number')
-        if not invoice_number:
-            return ''
-        
-        # Find matching supplier by invoice number
-        matching_suppliers = supplier_df[
-            supplier_df['Invoice Number'] == invoice_number
-        ]
-        
-        if not matching_suppliers.empty:
-            return str(matching_suppliers.iloc[0].get('VAT ID', ''))
-        
-        return ''
+    @staticmethod
+    def _map_vat(invoice_numbers: np.ndarray, vat_map: Dict[Any, str]) -> np.ndarray:
+        """VAT/company ID for every invoice number, '' when blank or not listed"""
+        vats = pd.Series(invoice_numbers, dtype=object).map(vat_map).fillna('').to_numpy(dtype=object, copy=True)
+        vats[~invoice_numbers.astype(bool)] = ''
+        return vats
     
-    def _extract_customer_vat(self, row: pd.Series, customer_df: pd.DataFrame) -> str:
-        """Extract customer VAT from customer details sheet"""
-        # Similar to supplier VAT extraction
-        if customer_df.empty:
-            return ''
-        
-        invoice_number = row.get('Invoice Number')
-        if not invoice_number:
-            return ''
-        
-        matching_customers = customer_df[
-            customer_df['Invoice Number'] == invoice_number
-        ]
-        
-        if not matching_customers.empty:
-            # Note: Customer details might not have VAT ID field
-            return str(matching_customers.iloc[0].get('Company ID', ''))
-        
-        return ''
+    @staticmethod
+    def _column(df: pd.DataFrame, name: str, default: Any = None) -> np.ndarray:
+        """Column values as an object array; a missing column yields the default for every row"""
+        if name in df.columns:
+            return df[name].to_numpy(dtype=object)
+        return np.full(len(df), default, dtype=object)
     
-    def _validate_bg_vat_format(self, vat_number: str) -> bool:
-        """Validate Bulgarian VAT number format"""
-        if not vat_number:
-            return False
-        
-        vat_clean = vat_number.replace(' ', '').upper()
-        return bool(re.match(r'^BG\d{9,10}$', vat_clean))
+    @staticmethod
+    def _blank_mask(values: np.ndarray) -> np.ndarray:
+        """True where a text cell is empty, NaN or whitespace only"""
+        return pd.isna(values) | (pd.Series(values, dtype=object).astype(str).str.strip() == '').to_numpy()
+    
+    def _date_columns(self, df: pd.DataFrame, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Period (YYYYMM) and YYYY-MM-DD date for every row of a date column, parsed in one pass"""
+        if name not in df.columns:
+            return (np.full(len(df), self._get_current_period(), dtype=object),
+                    np.full(len(df), None, dtype=object))
+        
+        dates = df[name]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            # Same rules as _format_date: datetimes and 'YYYY-MM-DD' strings, anything else is no date
+            usable = dates.map(lambda value: isinstance(value, (str, datetime))).astype(bool)
+            dates = pd.to_datetime(dates.where(usable), format='%Y-%m-%d', errors='coerce')
+        
+        periods = dates.dt.strftime('%Y%m').to_numpy(dtype=object, copy=True)
+        formatted = dates.dt.strftime('%Y-%m-%d').to_numpy(dtype=object, copy=True)
+        missing = dates.isna().to_numpy()
+        periods[missing] = self._get_current_period()
+        formatted[missing] = None
+        return periods, formatted
+    
+    def _decimal_column(self, df: pd.DataFrame, name: str) -> List[Tuple[Decimal, Optional[str]]]:
+        """_to_decimal results for every row of an amount column; numeric columns skip the per-cell checks"""
+        if name not in df.columns:
+            return [self._to_decimal(0, name)] * len(df)
+        
+        column = df[name]
+        if not pd.api.types.is_numeric_dtype(column):
+            # Text or mixed cells still need the per-cell cleaning rules
+            return [self._to_decimal(value, name, row_idx + 2)
+                    for row_idx, value in enumerate(column.to_numpy(dtype=object))]
+        
+        floats = column.to_numpy(dtype=float, na_value=np.nan)
+        converted = []
+        for row_idx, (value, missing) in enumerate(zip(floats.tolist(), np.isnan(floats))):
+            if missing:
+                converted.append((Decimal('0'), f"Row {row_idx + 2}: Empty value in field '{name}' - using 0.00"))
+            else:
+                converted.append((Decimal(repr(value)), None))
+        return converted
+    
+    @staticmethod
+    def _amount_checks(subtotals: List[Tuple[Decimal, Optional[str]]],
+                       vats: List[Tuple[Decimal, Optional[str]]],
+                       totals: List[Tuple[Decimal, Optional[str]]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Masks of rows with a tax base but no VAT, and rows where tax base + VAT misses the total by over 0.01"""
+        tax_bases = np.array([value for value, _ in subtotals], dtype=object)
+        vat_amounts = np.array([value for value, _ in vats], dtype=object)
+        total_amounts = np.array([value for value, _ in totals], dtype=object)
+        
+        vat_missing = ((tax_bases > 0) & (vat_amounts == 0)).astype(bool)
+        # Sum as Decimal first, then compare as floats - same arithmetic as the per-row check
+        difference = (tax_bases + vat_amounts).astype(float) - total_amounts.astype(float)
+        total_mismatch = np.abs(difference) > 0.01
+        return vat_missing, total_mismatch
     
-    def _calculate_period_from_date(self, date_value: Any) -> str:
-        """Calculate YYYYMM period from date"""
+    def _calculate_period_from_date(self, date_value: Any, current_period: Optional[str] = None) -> str:
+        """Calculate YYYYMM period from date, falling back to current_period (default: now)"""
         if not date_value:
-            return self._get_current_period()
+            return current_period or self._get_current_period()
         
         try:
             if isinstance(date_value, str):
@@ -550,11 +753,11 @@ class VATFileImportService:
             elif isinstance(date_value, datetime):
                 date_obj = date_value
             else:
-                return self._get_current_period()
+                return current_period or self._get_current_period()
             
             return f"{date_obj.year}{date_obj.month:02d}"
         except:
-            return self._get_current_period()
+            return current_period or self._get_current_period()
     
     def _get_current_period(self) -> str:
         """Get current period in YYYYMM format"""
@@ -599,10 +802,14 @@ class VATFileImportService:
             if isinstance(value, str):
                 original_value = value
                 # Remove currency symbols, spaces, and other non-numeric chars
-                cleaned_value = re.sub(r'[^\d.-]', '', str(value))
+                cleaned_value = _NUMBER_CLEAN_RE.sub('', str(value))
                 if not cleaned_value or cleaned_value in ['-', '.']:
                     return Decimal('0'), f"Row {row_num}: Invalid text '{original_value}' in field '{field_name}' - using 0.00"
-                return Decimal(cleaned_value), None
+                try:
+                    return Decimal(cleaned_value), None
+                except InvalidOperation:
+                    # e.g. '1.2.3' or '12-5' left over after cleaning
+                    return Decimal('0'), f"Row {row_num}: Invalid text '{original_value}' in field '{field_name}' - using 0.00"
             else:
                 # For numeric types, convert directly
                 float_value = float(value)
@@ -615,12 +822,22 @@ class VATFileImportService:
     
     def _serialize_decimals(self, obj: Any) -> Any:
         """Convert Decimal objects to floats for JSON serialization"""
+        if orjson is not None:
+            try:
+                # One C-level encode/decode instead of rebuilding the tree in Python
+                return orjson.loads(orjson.dumps(obj, default=_decimal_to_float))
+            except orjson.JSONEncodeError:
+                pass  # e.g. non-string keys or values orjson cannot encode
+        return self._convert_decimals(obj)
+    
+    def _convert_decimals(self, obj: Any) -> Any:
+        """Recursively replace Decimal objects with floats"""
         if isinstance(obj, Decimal):
             return float(obj)
         elif isinstance(obj, dict):
-            return {k: self._serialize_decimals(v) for k, v in obj.items()}
+            return {k: self._convert_decimals(v) for k, v in obj.items()}
         elif isinstance(obj, list):
-            return [self._serialize_decimals(item) for item in obj]
+            return [self._convert_decimals(item) for item in obj]
         else:
             return obj
 
@@ -653,18 +870,17 @@ class ImportPreviewGenerator:
                 tax_base = data.get('tax_base_20', 0)
                 vat_amount = data.get('vat_20', 0)
             
-            html_rows.append(f"""
-                <tr>
-                    <td>{journal_type.title()}</td>
-                    <td>{data.get('document_number', '')}</td>
-                    <td>{data.get('document_date', '')}</td>
-                    <td>{partner_name}</td>
-                    <td>{partner_vat}</td>
-                    <td class="text-right">{tax_base}</td>
-                    <td class="text-right">{vat_amount}</td>
-                    <td class="text-right">{data.get('total_amount', 0)}</td>
-                </tr>
-            """)
+            # Names and numbers come straight from the uploaded file
+            html_rows.append(_PREVIEW_ROW_TEMPLATE.format(*(escape(str(value)) for value in (
+                journal_type.title(),
+                data.get('document_number', ''),
+                data.get('document_date', ''),
+                partner_name,
+                partner_vat,
+                tax_base,
+                vat_amount,
+                data.get('total_amount', 0)
+            ))))
         
         html = f"""
         <table class="table table-striped">
@@ -1,11 +1,14 @@
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
+from sqlalchemy.exc import OperationalError
 import uvicorn
 from typing import List, Optional
 from datetime import datetime, date
 import logging
+import os
 
 from database import engine, Base, get_db
 from models import Company, PurchaseJournal, SalesJournal, VATDeclaration
@@ -29,8 +32,16 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Create database tables
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    except OperationalError as e:
+        # Another worker created them concurrently - retry skips existing tables
+        if "already exists" not in str(e.orig):
+            raise
+        logger.info("Tables created by another worker, re-checking schema")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
     yield
 
 # FastAPI app initialization
@@ -50,6 +61,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (journal lists, reports, exports)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Security
 security = HTTPBearer()
 
@@ -249,10 +263,20 @@ async def health_check():
     return {"status": "healthy", "timestamp": datetime.now()}
 
 if __name__ == "__main__":
+    # WEB_CONCURRENCY worker processes (e.g. 2 * cores + 1); auto-reload only
+    # for single-worker development. Each worker imports the app and creates
+    # its own engine/pool. Production equivalent:
+    #   gunicorn -k uvicorn.workers.UvicornWorker -w ${WEB_CONCURRENCY:-9} -b 0.0.0.0:8000 main:app
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    # "auto" uses uvloop/httptools when installed (pip install "uvicorn[standard]")
+    # and falls back to asyncio/h11, e.g. on Windows where uvloop is unavailable
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        workers=workers,
+        reload=workers == 1,
+        loop=os.getenv("UVICORN_LOOP", "auto"),
+        http=os.getenv("UVICORN_HTTP", "auto"),
         log_level="info"
     )
\ No newline at end of file
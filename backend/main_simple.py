@@ -1,10 +1,14 @@
 from fastapi import FastAPI, HTTPException, Depends, Query, status, UploadFile, File, Form
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from sqlalchemy import delete, func, select
 from typing import List, Optional, Dict
 from datetime import datetime
 import logging
 import tempfile
+import threading
+import time
 import os
 
 # Use synchronous database for simplicity
@@ -47,33 +51,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (journal lists, reports, exports)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # ============================================================================
 # COMPANY MANAGEMENT ENDPOINTS (Служебни функции)
 # ============================================================================
 
+# Company reads far outnumber writes - keep serialized responses in-process for
+# a short TTL and drop them on every company write (per worker; use a shared
+# store such as Redis with the same keys when running several workers)
+COMPANY_CACHE_TTL = float(os.getenv("COMPANY_CACHE_TTL", "60"))
+COMPANY_CACHE_MAXSIZE = 1024
+_company_cache: Dict[str, tuple] = {}
+_company_cache_lock = threading.Lock()  # sync endpoints run on threadpool threads
+_company_cache_generation = 0  # bumped by every invalidation
+
+def _company_cache_get(key: str) -> tuple:
+    """Return (cached payload or None, cache generation to hand to _company_cache_set)"""
+    with _company_cache_lock:
+        entry = _company_cache.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at >= time.monotonic():
+                return value, _company_cache_generation
+            del _company_cache[key]
+        return None, _company_cache_generation
+
+def _company_cache_set(key: str, value, generation: int) -> None:
+    """Cache a company payload unless a write invalidated the cache since it was read"""
+    with _company_cache_lock:
+        if generation != _company_cache_generation:
+            return
+        if len(_company_cache) >= COMPANY_CACHE_MAXSIZE:
+            del _company_cache[next(iter(_company_cache))]
+        _company_cache[key] = (time.monotonic() + COMPANY_CACHE_TTL, value)
+
+def _invalidate_company_cache(*uics: str) -> None:
+    """Drop the company list and the given per-UIC entries"""
+    global _company_cache_generation
+    with _company_cache_lock:
+        _company_cache_generation += 1
+        _company_cache.pop("list", None)
+        for uic in uics:
+            _company_cache.pop(f"uic:{uic}", None)
+
 @app.post("/api/companies", response_model=CompanyResponse, status_code=status.HTTP_201_CREATED)
 def create_company(company: CompanyCreate, db = Depends(get_db)):
     """Register a new company (Избор на задължено лице)"""
     try:
         service = CompanyService(db)
-        return service.create_company(company)
+        created = service.create_company(company)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    _invalidate_company_cache(created.uic)
+    return created
 
 @app.get("/api/companies/{uic}", response_model=CompanyResponse)
 def get_company(uic: str, db = Depends(get_db)):
     """Get company details by UIC"""
+    key = f"uic:{uic}"
+    cached, generation = _company_cache_get(key)
+    if cached is not None:
+        return cached
     service = CompanyService(db)
     company = service.get_company(uic)
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
-    return company
+    payload = CompanyResponse.model_validate(company).model_dump()
+    _company_cache_set(key, payload, generation)
+    return payload
 
 @app.get("/api/companies", response_model=List[CompanyResponse])
 def list_companies(db = Depends(get_db)):
     """List all registered companies"""
+    cached, generation = _company_cache_get("list")
+    if cached is not None:
+        return cached
     service = CompanyService(db)
-    return service.list_companies()
+    payload = [CompanyResponse.model_validate(c).model_dump() for c in service.list_companies()]
+    _company_cache_set("list", payload, generation)
+    return payload
 
 @app.delete("/api/companies/{company_id}")
 def delete_company(company_id: int, force: bool = False, db = Depends(get_db)):
@@ -83,14 +141,15 @@ def delete_company(company_id: int, force: bool = False, db = Depends(get_db)):
         company_id: ID of company to delete
         force: If True, deletes all associated records (purchases, sales, declarations)
     """
-    company = db.query(Company).filter(Company.id == company_id).first()
+    company = db.get(Company, company_id)
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    # Count associated records
-    purchases_count = db.query(PurchaseJournal).filter(PurchaseJournal.company_id == company_id).count()
-    sales_count = db.query(SalesJournal).filter(SalesJournal.company_id == company_id).count()
-    declarations_count = db.query(VATDeclaration).filter(VATDeclaration.company_id == company_id).count()
+    # Count associated records in one round-trip
+    purchases_count, sales_count, declarations_count = db.execute(select(
+        *(select(func.count()).select_from(model).where(model.company_id == company_id).scalar_subquery()
+          for model in (PurchaseJournal, SalesJournal, VATDeclaration))
+    )).one()
     
     if (purchases_count > 0 or sales_count > 0 or declarations_count > 0) and not force:
         raise HTTPException(
@@ -109,20 +168,19 @@ def delete_company(company_id: int, force: bool = False, db = Depends(get_db)):
     
     # If force=True, delete all associated records first
     if force:
-        # Delete VAT declarations
-        db.query(VATDeclaration).filter(VATDeclaration.company_id == company_id).delete()
-        
-        # Delete purchase journal entries
-        db.query(PurchaseJournal).filter(PurchaseJournal.company_id == company_id).delete()
-        
-        # Delete sales journal entries  
-        db.query(SalesJournal).filter(SalesJournal.company_id == company_id).delete()
-        
-        db.commit()  # Commit the deletions
+        # Delete declarations and journal entries in the same transaction as the
+        # company; none of these rows are loaded, so skip in-session synchronization
+        for model in (VATDeclaration, PurchaseJournal, SalesJournal):
+            db.execute(
+                delete(model).where(model.company_id == company_id),
+                execution_options={"synchronize_session": False}
+            )
     
     # Delete the company
+    uic = company.uic
     db.delete(company)
     db.commit()
+    _invalidate_company_cache(uic)
     
     return {
         "message": "Company deleted successfully",
@@ -136,11 +194,12 @@ def delete_company(company_id: int, force: bool = False, db = Depends(get_db)):
 @app.put("/api/companies/{company_id}", response_model=CompanyResponse)
 def update_company(company_id: int, company_update: CompanyCreate, db = Depends(get_db)):
     """Update company details"""
-    company = db.query(Company).filter(Company.id == company_id).first()
+    company = db.get(Company, company_id)
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
     # Update company fields
+    previous_uic = company.uic
     company.name = company_update.name
     company.uic = company_update.uic
     company.vat_number = company_update.vat_number
@@ -149,6 +208,7 @@ def update_company(company_id: int, company_update: CompanyCreate, db = Depends(
     
     db.commit()
     db.refresh(company)
+    _invalidate_company_cache(previous_uic, company.uic)
     
     return CompanyResponse(
         id=company.id,
@@ -185,7 +245,7 @@ def get_purchases(uic: str, period: str, db = Depends(get_db)):
 @app.post("/api/purchases/{entry_id}/credit-note")
 def convert_to_credit_note(entry_id: int, db = Depends(get_db)):
     """Convert purchase entry to credit note"""
-    entry = db.query(PurchaseJournal).filter(PurchaseJournal.id == entry_id).first()
+    entry = db.get(PurchaseJournal, entry_id)
     if not entry:
         raise HTTPException(status_code=404, detail="Purchase entry not found")
     
@@ -285,7 +345,7 @@ def submit_declaration(declaration_id: int, db = Depends(get_db)):
         service = DeclarationService(db)
         
         # Get the declaration by ID
-        declaration = db.query(VATDeclaration).filter(VATDeclaration.id == declaration_id).first()
+        declaration = db.get(VATDeclaration, declaration_id)
         if not declaration:
             raise HTTPException(status_code=404, detail="Declaration not found")
         
@@ -372,7 +432,7 @@ def get_company_vat_summary(
         from datetime import datetime
         
         # Validate company exists
-        company = db.query(Company).filter(Company.id == company_id).first()
+        company = db.get(Company, company_id)
         if not company:
             raise HTTPException(status_code=404, detail="Company not found")
             
@@ -464,7 +524,7 @@ def get_company_monthly_breakdown(
         from collections import defaultdict
         
         # Validate company exists
-        company = db.query(Company).filter(Company.id == company_id).first()
+        company = db.get(Company, company_id)
         if not company:
             raise HTTPException(status_code=404, detail="Company not found")
             
@@ -556,7 +616,7 @@ def get_company_eu_transactions(
         from datetime import datetime
         
         # Validate company exists
-        company = db.query(Company).filter(Company.id == company_id).first()
+        company = db.get(Company, company_id)
         if not company:
             raise HTTPException(status_code=404, detail="Company not found")
             
@@ -993,7 +1053,7 @@ def export_declaration_package(declaration_id: int, db = Depends(get_db)):
         zip_file_path = export_service.export_declaration_package(declaration_id)
         
         # Get declaration info for filename
-        declaration = db.query(VATDeclaration).filter(VATDeclaration.id == declaration_id).first()
+        declaration = db.get(VATDeclaration, declaration_id)
         company_uic = declaration.company.uic
         period = declaration.period
         
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Decimal, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Boolean, ForeignKey, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -40,13 +40,13 @@ class PurchaseJournal(Base):
     supplier_vat = Column(String(15))
     
     # Amounts
-    tax_base = Column(Decimal(15, 2), default=0)           # Данъчна основа
-    vat_amount = Column(Decimal(15, 2), default=0)         # ДДС сума
-    total_amount = Column(Decimal(15, 2), default=0)       # Field 09: For non-VAT items (ДО + ДДС)
+    tax_base = Column(Numeric(15, 2), default=0)           # Данъчна основа
+    vat_amount = Column(Numeric(15, 2), default=0)         # ДДС сума
+    total_amount = Column(Numeric(15, 2), default=0)       # Field 09: For non-VAT items (ДО + ДДС)
     
     # Credit note fields (negative amounts)
-    credit_tax_base = Column(Decimal(15, 2), default=0)    # Field 10: negative tax base
-    credit_vat = Column(Decimal(15, 2), default=0)         # Field 11: negative VAT
+    credit_tax_base = Column(Numeric(15, 2), default=0)    # Field 10: negative tax base
+    credit_vat = Column(Numeric(15, 2), default=0)         # Field 11: negative VAT
     
     notes = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -70,14 +70,14 @@ class SalesJournal(Base):
     customer_vat = Column(String(15))
     
     # VAT amounts
-    tax_base_20 = Column(Decimal(15, 2), default=0)        # Field 11: Tax base for 20% VAT
-    vat_20 = Column(Decimal(15, 2), default=0)             # Field 12: 20% VAT amount
+    tax_base_20 = Column(Numeric(15, 2), default=0)        # Field 11: Tax base for 20% VAT
+    vat_20 = Column(Numeric(15, 2), default=0)             # Field 12: 20% VAT amount
     
     # Other rates (if needed in future)
-    tax_base_0 = Column(Decimal(15, 2), default=0)         # 0% VAT deliveries
-    tax_base_exempt = Column(Decimal(15, 2), default=0)    # Exempt deliveries
+    tax_base_0 = Column(Numeric(15, 2), default=0)         # 0% VAT deliveries
+    tax_base_exempt = Column(Numeric(15, 2), default=0)    # Exempt deliveries
     
-    total_amount = Column(Decimal(15, 2), default=0)       # Total invoice amount
+    total_amount = Column(Numeric(15, 2), default=0)       # Total invoice amount
     
     notes = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -94,13 +94,13 @@ class VATDeclaration(Base):
     period = Column(String(6), nullable=False, index=True)  # YYYYMM
     
     # Declaration fields (based on original form structure)
-    field_50 = Column(Decimal(15, 2), default=0)           # Sales VAT (ДДС от продажби)
-    field_60 = Column(Decimal(15, 2), default=0)           # Purchase VAT (ДДС от покупки)  
-    field_80 = Column(Decimal(15, 2), default=0)           # Refund amount (Възстановяване)
+    field_50 = Column(Numeric(15, 2), default=0)           # Sales VAT (ДДС от продажби)
+    field_60 = Column(Numeric(15, 2), default=0)           # Purchase VAT (ДДС от покупки)  
+    field_80 = Column(Numeric(15, 2), default=0)           # Refund amount (Възстановяване)
     
     # Calculated amounts
-    payment_due = Column(Decimal(15, 2), default=0)        # Amount to pay (Field 50 - Field 60)
-    refund_due = Column(Decimal(15, 2), default=0)         # Amount to refund (Field 60 - Field 50)
+    payment_due = Column(Numeric(15, 2), default=0)        # Amount to pay (Field 50 - Field 60)
+    refund_due = Column(Numeric(15, 2), default=0)         # Amount to refund (Field 60 - Field 50)
     
     # Status tracking
     status = Column(String(20), default="DRAFT")           # DRAFT, SUBMITTED, PAID, REFUNDED
@@ -1,5 +1,5 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, func
 from sqlalchemy.orm import selectinload
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -312,42 +312,31 @@ class DeclarationService:
     
     async def _calculate_sales_vat(self, company_id: int, period: str) -> Decimal:
         """Calculate total sales VAT for period (Field 50)"""
-        result = await self.db.execute(
-            select(SalesJournal).where(
+        # Summed in SQL - one row back instead of every journal entry
+        total = await self.db.scalar(
+            select(func.sum(func.coalesce(SalesJournal.vat_20, 0))).where(
                 and_(
                     SalesJournal.company_id == company_id,
                     SalesJournal.period == period
                 )
             )
         )
-        entries = result.scalars().all()
-        
-        total = Decimal('0')
-        for entry in entries:
-            total += entry.vat_20 or 0
-        
-        return total
+        return total or Decimal('0')
     
     async def _calculate_purchase_vat(self, company_id: int, period: str) -> Decimal:
         """Calculate total purchase VAT for period (Field 60)"""
-        result = await self.db.execute(
-            select(PurchaseJournal).where(
+        # Regular VAT plus credit note VAT (negative), summed in SQL
+        total = await self.db.scalar(
+            select(func.sum(
+                func.coalesce(PurchaseJournal.vat_amount, 0) + func.coalesce(PurchaseJournal.credit_vat, 0)
+            )).where(
                 and_(
                     PurchaseJournal.company_id == company_id,
                     PurchaseJournal.period == period
                 )
             )
         )
-        entries = result.scalars().all()
-        
-        total = Decimal('0')
-        for entry in entries:
-            # Regular VAT
-            total += entry.vat_amount or 0
-            # Credit note VAT (negative)
-            total += entry.credit_vat or 0
-        
-        return total
+        return total or Decimal('0')
     
     def _calculate_payment_deadline(self, period: str) -> datetime:
         """Calculate payment deadline (14th of following month)"""
@@ -1,5 +1,6 @@
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 from decimal import Decimal
 
@@ -58,12 +59,37 @@ class JournalService:
         if not company:
             raise ValueError("Фирмата не е намерена")
         
+        entry = PurchaseJournal(**self._purchase_entry_values(company.id, entry_data))
+        self.db.add(entry)
+        self.db.commit()
+        self.db.refresh(entry)
+        
+        return entry
+    
+    def add_purchase_entries_bulk(self, uic: str, entries_data: List[PurchaseJournalCreate]) -> List[PurchaseJournal]:
+        """Add several purchase entries for one company in a single transaction"""
+        company = self.db.query(Company).filter(Company.uic == uic).first()
+        if not company:
+            raise ValueError("Фирмата не е намерена")
+        
+        rows = [self._purchase_entry_values(company.id, entry_data) for entry_data in entries_data]
+        if not rows:
+            return []
+        
+        # One multi-row INSERT ... RETURNING instead of a flush per object
+        entries = self.db.scalars(insert(PurchaseJournal).returning(PurchaseJournal), rows).all()
+        self.db.commit()
+        
+        return entries
+    
+    def _purchase_entry_values(self, company_id: int, entry_data: PurchaseJournalCreate) -> Dict[str, Any]:
+        """Validate a purchase entry and return its column values"""
         # Validate period format
         if not self._validate_period(entry_data.period):
             raise ValueError("Некоректна година в полето Период - използвайте YYYYMM формат")
         
-        entry = PurchaseJournal(
-            company_id=company.id,
+        values = dict(
+            company_id=company_id,
             period=entry_data.period,
             document_type=entry_data.document_type,
             document_number=entry_data.document_number,
@@ -80,14 +106,10 @@ class JournalService:
         
         # Handle credit notes (Кредитно известие)
         if entry_data.document_type == 3:
-            entry.credit_tax_base = -abs(entry.credit_tax_base or 0)
-            entry.credit_vat = -abs(entry.credit_vat or 0)
+            values['credit_tax_base'] = -abs(values['credit_tax_base'] or 0)
+            values['credit_vat'] = -abs(values['credit_vat'] or 0)
         
-        self.db.add(entry)
-        self.db.commit()
-        self.db.refresh(entry)
-        
-        return entry
+        return values
     
     def get_purchases(self, uic: str, period: str) -> List[PurchaseJournal]:
         """Get purchase entries for period"""
@@ -107,6 +129,31 @@ class JournalService:
         if not company:
             raise ValueError("Фирмата не е намерена")
         
+        entry = SalesJournal(**self._sales_entry_values(company.id, entry_data))
+        self.db.add(entry)
+        self.db.commit()
+        self.db.refresh(entry)
+        
+        return entry
+    
+    def add_sales_entries_bulk(self, uic: str, entries_data: List[SalesJournalCreate]) -> List[SalesJournal]:
+        """Add several sales entries for one company in a single transaction"""
+        company = self.db.query(Company).filter(Company.uic == uic).first()
+        if not company:
+            raise ValueError("Фирмата не е намерена")
+        
+        rows = [self._sales_entry_values(company.id, entry_data) for entry_data in entries_data]
+        if not rows:
+            return []
+        
+        # One multi-row INSERT ... RETURNING instead of a flush per object
+        entries = self.db.scalars(insert(SalesJournal).returning(SalesJournal), rows).all()
+        self.db.commit()
+        
+        return entries
+    
+    def _sales_entry_values(self, company_id: int, entry_data: SalesJournalCreate) -> Dict[str, Any]:
+        """Validate a sales entry and return its column values"""
         if not self._validate_period(entry_data.period):
             raise ValueError("Некоректна година в полето Период")
         
@@ -115,8 +162,8 @@ class JournalService:
         if entry_data.tax_base_20 and not vat_20:
             vat_20 = entry_data.tax_base_20 * Decimal('0.20')
         
-        entry = SalesJournal(
-            company_id=company.id,
+        return dict(
+            company_id=company_id,
             period=entry_data.period,
             document_type=entry_data.document_type,
             document_number=entry_data.document_number,
@@ -130,12 +177,6 @@ class JournalService:
             total_amount=(entry_data.tax_base_20 or 0) + (vat_20 or 0),
             notes=entry_data.notes
         )
-        
-        self.db.add(entry)
-        self.db.commit()
-        self.db.refresh(entry)
-        
-        return entry
     
     def get_sales(self, uic: str, period: str) -> List[SalesJournal]:
         """Get sales entries for period"""
@@ -150,7 +191,7 @@ class JournalService:
     
     def delete_purchase_entry(self, entry_id: int) -> bool:
         """Delete a purchase journal entry"""
-        entry = self.db.query(PurchaseJournal).filter(PurchaseJournal.id == entry_id).first()
+        entry = self.db.get(PurchaseJournal, entry_id)
         if not entry:
             raise ValueError("Записът не е намерен")
         
@@ -160,7 +201,7 @@ class JournalService:
     
     def delete_sales_entry(self, entry_id: int) -> bool:
         """Delete a sales journal entry"""
-        entry = self.db.query(SalesJournal).filter(SalesJournal.id == entry_id).first()
+        entry = self.db.get(SalesJournal, entry_id)
         if not entry:
             raise ValueError("Записът не е намерен")
         
@@ -294,9 +335,7 @@ class DeclarationService:
     
     def revert_declaration(self, declaration_id: int) -> VATDeclaration:
         """Revert a submitted declaration back to DRAFT status"""
-        declaration = self.db.query(VATDeclaration).filter(
-            VATDeclaration.id == declaration_id
-        ).first()
+        declaration = self.db.get(VATDeclaration, declaration_id)
         
         if not declaration:
             raise ValueError("Декларацията не е намерена")
@@ -316,9 +355,7 @@ class DeclarationService:
     
     def delete_declaration(self, declaration_id: int) -> bool:
         """Delete a VAT declaration"""
-        declaration = self.db.query(VATDeclaration).filter(
-            VATDeclaration.id == declaration_id
-        ).first()
+        declaration = self.db.get(VATDeclaration, declaration_id)
         
         if not declaration:
             raise ValueError("Декларацията не е намерена")
@@ -0,0 +1,19 @@
+"""Connection PRAGMAs shared by every SQLite engine in the backend"""
+
+# WAL lets readers proceed while a write is in progress and NORMAL sync
+# takes the fsync off most commits; the rest keep temp data and hot pages
+# in memory (64 MiB page cache, 256 MiB memory-mapped I/O)
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "mmap_size=268435456",
+    "cache_size=-65536",
+)
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Engine "connect" listener applying SQLITE_PRAGMAS to a new connection"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
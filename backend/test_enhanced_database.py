@@ -0,0 +1,156 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+from sqlalchemy import MetaData, Numeric, UniqueConstraint, create_engine, func, inspect
+from sqlalchemy.orm import sessionmaker
+
+import database_sync
+import enhanced_database
+from enhanced_models import EnhancedCompany, EnhancedPurchaseEntry, EnhancedVATDeclaration
+from models_sync import Company, PurchaseJournal, SalesJournal, VATDeclaration
+
+@pytest.fixture
+def legacy_session(tmp_path, monkeypatch):
+    """Legacy (models_sync) database the migration reads from, with one company's data."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    database_sync.Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(database_sync, "SessionLocal", session_factory)
+    with session_factory() as db:
+        company = Company(uic="222222222", vat_number="BG222222222", name="Migration Test")
+        db.add(company)
+        db.commit()
+        db.add_all([
+            PurchaseJournal(
+                company_id=company.id, period="202107", document_number="MIG-P1",
+                document_date=date(2021, 7, 1), tax_base=100, vat_amount=20
+            ),
+            SalesJournal(
+                company_id=company.id, period="202107", document_number="MIG-S1",
+                document_date=date(2021, 7, 2), tax_base_20=50, vat_20=10
+            ),
+            VATDeclaration(company_id=company.id, period="202107"),
+        ])
+        db.commit()
+    yield session_factory
+    engine.dispose()
+
+@pytest.fixture
+def enhanced_engine(tmp_path):
+    """Empty enhanced database with the current schema."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'enhanced.db'}")
+    database_sync.Base.metadata.create_all(bind=engine, tables=enhanced_database._enhanced_tables())
+    yield engine
+    engine.dispose()
+
+# ============================================================================
+# MIGRATION TESTS
+# ============================================================================
+
+def test_migration_without_declaration_unique_key(legacy_session, enhanced_engine):
+    """Test re-running the migration on a declarations table created before its unique key."""
+    # Recreate the table the way older databases have it: no (company_id, period) constraint
+    old_metadata = MetaData()
+    EnhancedCompany.__table__.to_metadata(old_metadata)
+    old_table = EnhancedVATDeclaration.__table__.to_metadata(old_metadata)
+    old_table.constraints = {
+        constraint for constraint in old_table.constraints
+        if not isinstance(constraint, UniqueConstraint)
+    }
+    EnhancedVATDeclaration.__table__.drop(bind=enhanced_engine)
+    old_table.create(bind=enhanced_engine)
+
+    new_session = sessionmaker(bind=enhanced_engine)
+    enhanced_database.migrate_existing_data(new_session)
+    enhanced_database.migrate_existing_data(new_session)
+
+    with new_session() as db:
+        assert db.query(EnhancedVATDeclaration).count() == 1
+
+def test_failed_migration_keeps_journal_indexes(legacy_session, enhanced_engine, monkeypatch):
+    """Test that a failed re-run of the migration leaves the bulk-load indexes in place."""
+    def journal_indexes():
+        inspector = inspect(enhanced_engine)
+        return {
+            index["name"]
+            for table in ("purchase_entries_enhanced", "sales_entries_enhanced", "vat_declarations_enhanced")
+            for index in inspector.get_indexes(table)
+        }
+
+    new_session = sessionmaker(bind=enhanced_engine)
+    enhanced_database.migrate_existing_data(new_session)
+    indexes = journal_indexes()
+    assert indexes
+
+    # Companies are already migrated, so the re-run starts with the index drops
+    def failing_insert(session, statement, rows):
+        raise RuntimeError("forced failure")
+    monkeypatch.setattr(enhanced_database, "_insert_batch", failing_insert)
+    with pytest.raises(RuntimeError):
+        enhanced_database.migrate_existing_data(new_session)
+
+    assert journal_indexes() == indexes
+
+# ============================================================================
+# MONEY TYPE TESTS
+# ============================================================================
+
+def test_money_round_trip(enhanced_engine):
+    """Test that amounts round half-up to stotinki and read back as Decimal lev."""
+    with sessionmaker(bind=enhanced_engine)() as db:
+        company = EnhancedCompany(uic="333333333", vat_number="BG333333333", name="Money Test")
+        db.add(company)
+        db.commit()
+        entry = EnhancedPurchaseEntry(
+            company_id=company.id, period="202108", document_type=1,
+            tax_base=Decimal("100.505"), vat_amount=Decimal("20.10"),
+            credit_tax_base=Decimal("-50.005"), credit_vat=Decimal("-10.00")
+        )
+        db.add(entry)
+        db.commit()
+        db.expire_all()
+
+        stored = db.get(EnhancedPurchaseEntry, entry.id)
+        assert stored.tax_base == Decimal("100.51")
+        assert stored.vat_amount == Decimal("20.10")
+        assert stored.credit_tax_base == Decimal("-50.01")
+        assert stored.credit_vat == Decimal("-10.00")
+        assert isinstance(stored.tax_base, Decimal)
+
+        raw = db.connection().exec_driver_sql(
+            "SELECT tax_base, credit_vat FROM purchase_entries_enhanced"
+        ).one()
+        assert tuple(raw) == (10051, -1000)
+
+def test_money_sum_returns_lev(enhanced_engine):
+    """Test that SUM over a Money column comes back as Decimal lev, not stotinki."""
+    with sessionmaker(bind=enhanced_engine)() as db:
+        company = EnhancedCompany(uic="444444444", vat_number="BG444444444", name="Money Sum Test")
+        db.add(company)
+        db.commit()
+        db.add_all([
+            EnhancedPurchaseEntry(company_id=company.id, period="202109", document_type=1, vat_amount=Decimal("20.10")),
+            EnhancedPurchaseEntry(company_id=company.id, period="202109", document_type=3, vat_amount=Decimal("-5.05")),
+        ])
+        db.commit()
+
+        total = db.query(func.sum(EnhancedPurchaseEntry.vat_amount)).scalar()
+        assert total == Decimal("15.05")
+        assert isinstance(total, Decimal)
+
+def test_lev_amount_columns_are_rejected(enhanced_engine):
+    """Test that tables from before integer stotinki storage are refused, not misread."""
+    old_metadata = MetaData()
+    EnhancedCompany.__table__.to_metadata(old_metadata)
+    old_table = EnhancedPurchaseEntry.__table__.to_metadata(old_metadata)
+    old_table.c.tax_base.type = Numeric(15, 2)
+    EnhancedPurchaseEntry.__table__.drop(bind=enhanced_engine)
+    old_table.create(bind=enhanced_engine)
+
+    with pytest.raises(RuntimeError, match="purchase_entries_enhanced"):
+        enhanced_database._check_money_columns(
+            inspect(enhanced_engine), enhanced_database._enhanced_tables()
+        )
+    enhanced_database._check_money_columns(
+        inspect(enhanced_engine), [EnhancedVATDeclaration.__table__]
+    )
@@ -0,0 +1,122 @@
+import pytest
+from decimal import Decimal
+from sqlalchemy import create_engine, delete, insert, update
+from sqlalchemy.orm import sessionmaker
+
+import database_sync
+import enhanced_database
+from enhanced_models import EnhancedSalesEntry, SalesFieldTotals
+from enhanced_schemas import EnhancedCompanyCreate, EnhancedSalesEntryCreate
+from enhanced_services import (
+    SALES_FIELD_NAMES, EnhancedCompanyService, EnhancedSalesService, EnhancedVATDeclarationService
+)
+
+COMPANY_UIC = "555555555"
+
+@pytest.fixture
+def db(tmp_path):
+    """Session on an empty enhanced database with one registered company."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'enhanced.db'}")
+    database_sync.Base.metadata.create_all(bind=engine, tables=enhanced_database._enhanced_tables())
+    session = sessionmaker(bind=engine, expire_on_commit=False)()
+    EnhancedCompanyService(session).create_company(EnhancedCompanyCreate(
+        uic=COMPANY_UIC, vat_number=f"BG{COMPANY_UIC}", name="Field Totals Test"
+    ))
+    yield session
+    session.close()
+    engine.dispose()
+
+def sales_entry(number: str, period: str = "202110", **amounts) -> EnhancedSalesEntryCreate:
+    """Domestic invoice with the given declaration field amounts."""
+    return EnhancedSalesEntryCreate(period=period, document_type=1, document_number=number, **amounts)
+
+def materialized_totals(db, company_id: int, period: str) -> dict:
+    """Field totals stored in the materialized row."""
+    db.expire_all()
+    row = db.get(SalesFieldTotals, (company_id, period))
+    assert row is not None
+    return {field_name: getattr(row, field_name) for field_name in SALES_FIELD_NAMES}
+
+# ============================================================================
+# SALES FIELD TOTALS TESTS
+# ============================================================================
+
+def test_field_totals_follow_inserts(db):
+    """Test that single and batch inserts keep the materialized totals equal to the journal."""
+    service = EnhancedSalesService(db)
+
+    # Empty period seeded by a single insert, then extended by a batch
+    entry = service.create_sales_entry(COMPANY_UIC, sales_entry("FT-1", field_09=Decimal("100.10"), field_10=Decimal("20.02")))
+    company_id = entry.company_id
+    assert materialized_totals(db, company_id, "202110") == service._aggregate_field_totals(company_id, "202110")
+    service.create_many(COMPANY_UIC, [
+        sales_entry("FT-2", field_09=Decimal("50.00"), field_10=Decimal("10.00")),
+        sales_entry("FT-3", field_11=Decimal("5.55")),
+    ])
+    assert materialized_totals(db, company_id, "202110") == service._aggregate_field_totals(company_id, "202110")
+
+    # Empty period seeded by a batch, then extended by a single insert
+    service.create_many(COMPANY_UIC, [sales_entry("FT-4", period="202111", field_09=Decimal("1.01"))])
+    service.create_sales_entry(COMPANY_UIC, sales_entry("FT-5", period="202111", field_12=Decimal("2.02")))
+    assert materialized_totals(db, company_id, "202111") == service._aggregate_field_totals(company_id, "202111")
+
+    totals = service.calculate_field_totals(COMPANY_UIC, "202110")
+    assert totals["field_09"] == Decimal("150.10")
+    assert totals["field_11"] == Decimal("5.55")
+
+def test_field_totals_concurrent_seed(db, monkeypatch):
+    """Test that losing the seed insert to a concurrent writer adds this batch on top of its row."""
+    service = EnhancedSalesService(db)
+    company_id = service.create_sales_entry(COMPANY_UIC, sales_entry("CS-0", period="202112")).company_id
+    db.execute(delete(SalesFieldTotals))
+    db.commit()
+
+    # Journal rows loaded without the service - the seed must pick them up
+    db.execute(insert(EnhancedSalesEntry), [
+        {"company_id": company_id, "period": "202112", "document_type": 1,
+         "document_number": "CS-1", "field_09": Decimal("10.00")},
+    ])
+    db.commit()
+    earlier_totals = service._aggregate_field_totals(company_id, "202112")
+    earlier_count, earlier_last_id = service._journal_fingerprint(company_id, "202112")
+
+    # Another writer seeds the row (from the journal it saw) just before this insert's seed
+    aggregate = EnhancedSalesService._aggregate_field_totals
+    def racing_aggregate(self, company_id, period):
+        monkeypatch.setattr(EnhancedSalesService, "_aggregate_field_totals", aggregate)
+        self.db.execute(insert(SalesFieldTotals).values(
+            company_id=company_id, period=period,
+            entry_count=earlier_count, last_entry_id=earlier_last_id, **earlier_totals
+        ))
+        return aggregate(self, company_id, period)
+    monkeypatch.setattr(EnhancedSalesService, "_aggregate_field_totals", racing_aggregate)
+
+    service.create_many(COMPANY_UIC, [sales_entry("CS-2", period="202112", field_09=Decimal("2.50"))])
+
+    assert materialized_totals(db, company_id, "202112") == service._aggregate_field_totals(company_id, "202112")
+    assert service.calculate_field_totals(COMPANY_UIC, "202112")["field_09"] == Decimal("12.50")
+
+def test_field_totals_ignore_stale_row(db):
+    """Test that a row no longer matching the journal is bypassed for a live aggregate."""
+    service = EnhancedSalesService(db)
+    service.create_many(COMPANY_UIC, [
+        sales_entry("ST-1", period="202201", field_09=Decimal("30.00")),
+        sales_entry("ST-2", period="202201", field_09=Decimal("70.00")),
+    ])
+    db.execute(delete(EnhancedSalesEntry).where(EnhancedSalesEntry.document_number == "ST-2"))
+    db.commit()
+
+    assert service.calculate_field_totals(COMPANY_UIC, "202201")["field_09"] == Decimal("30.00")
+
+def test_declaration_uses_journal_totals(db):
+    """Test that a declaration is computed from the journal, not the materialized row."""
+    service = EnhancedSalesService(db)
+    service.create_sales_entry(COMPANY_UIC, sales_entry("DJ-1", period="202202", field_09=Decimal("40.00")))
+    # In-place correction the materialized row does not see
+    db.execute(update(EnhancedSalesEntry).where(
+        EnhancedSalesEntry.document_number == "DJ-1"
+    ).values(field_09=Decimal("45.00")))
+    db.commit()
+
+    declaration = EnhancedVATDeclarationService(db).generate_declaration(COMPANY_UIC, "202202")
+    assert declaration.field_09 == Decimal("45.00")
@@ -0,0 +1,75 @@
+import importlib
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database_sync
+from services_sync import CompanyService
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """main_simple with its company cache emptied and get_db bound to a temporary database."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    # The module calls create_tables() on first import - keep it off ./vat_system.db
+    monkeypatch.setattr(database_sync, "engine", engine)
+    main_simple = importlib.import_module("main_simple")
+    database_sync.create_tables()
+    session_factory = sessionmaker(bind=engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main_simple.app.dependency_overrides[database_sync.get_db] = override_get_db
+    main_simple._company_cache.clear()
+    yield main_simple
+    main_simple.app.dependency_overrides.clear()
+    main_simple._company_cache.clear()
+    engine.dispose()
+
+@pytest.fixture
+def client(app_module):
+    return TestClient(app_module.app)
+
+def company_data(uic: str, name: str = "Cache Test") -> dict:
+    return {"uic": uic, "vat_number": f"BG{uic}", "name": name}
+
+# ============================================================================
+# COMPANY CACHE TESTS
+# ============================================================================
+
+def test_company_cache_invalidated_on_writes(client, app_module):
+    """Test that create, update and delete drop the cached list and per-UIC entries."""
+    created = client.post("/api/companies", json=company_data("111111111")).json()
+    assert [c["uic"] for c in client.get("/api/companies").json()] == ["111111111"]
+    assert client.get("/api/companies/111111111").status_code == 200
+    assert {"list", "uic:111111111"} <= set(app_module._company_cache)
+
+    # A UIC change must drop both the old and the new key
+    response = client.put(f"/api/companies/{created['id']}", json=company_data("222222222", "Renamed"))
+    assert response.status_code == 200
+    assert client.get("/api/companies/111111111").status_code == 404
+    assert client.get("/api/companies/222222222").json()["name"] == "Renamed"
+    assert [c["uic"] for c in client.get("/api/companies").json()] == ["222222222"]
+
+    assert client.delete(f"/api/companies/{created['id']}").status_code == 200
+    assert client.get("/api/companies").json() == []
+    assert client.get("/api/companies/222222222").status_code == 404
+
+def test_company_cache_skips_fill_after_invalidation(client, app_module, monkeypatch):
+    """Test that a read overlapping a write does not cache the row it loaded before the write."""
+    client.post("/api/companies", json=company_data("333333333"))
+
+    get_company = CompanyService.get_company
+    def racing_get_company(self, uic):
+        company = get_company(self, uic)
+        app_module._invalidate_company_cache(uic)
+        return company
+    monkeypatch.setattr(CompanyService, "get_company", racing_get_company)
+
+    assert client.get("/api/companies/333333333").status_code == 200
+    assert "uic:333333333" not in app_module._company_cache
@@ -9,6 +9,7 @@ API Documentation: https://ec.europa.eu/taxation_customs/vies/rest-api/
 
 import requests
 import logging
+import threading
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from dataclasses import dataclass
@@ -38,8 +39,29 @@ class VIESValidationService:
     def __init__(self):
         self.base_url = "https://ec.europa.eu/taxation_customs/vies/rest-api"
         self.timeout = 10  # seconds
-        self.cache = {}  # Simple cache for validated numbers
+        self.cache = {}  # Validated numbers, oldest first: key -> (result, cached_time)
         self.cache_duration = timedelta(hours=24)  # Cache for 24 hours
+        self.cache_max_entries = 10000  # Oldest entries are evicted beyond this
+        self._cache_lock = threading.Lock()  # shared by worker threads of bulk validation
+        
+    def _get_cached(self, cache_key: tuple) -> Optional[VATValidationResult]:
+        """Return an unexpired cached result, dropping it once expired"""
+        with self._cache_lock:
+            cached = self.cache.get(cache_key)
+            if cached is None:
+                return None
+            cached_result, cached_time = cached
+            if datetime.now() - cached_time < self.cache_duration:
+                return cached_result
+            del self.cache[cache_key]
+            return None
+        
+    def _store_cached(self, cache_key: tuple, result: VATValidationResult):
+        """Cache a result, evicting the oldest entry when full"""
+        with self._cache_lock:
+            if len(self.cache) >= self.cache_max_entries:
+                del self.cache[next(iter(self.cache))]
+            self.cache[cache_key] = (result, datetime.now())
         
     def validate_vat_number(
         self, 
@@ -66,12 +88,11 @@ class VIESValidationService:
         """
         
         # Check cache first
-        cache_key = f"{country_code}:{vat_number}"
-        if cache_key in self.cache:
-            cached_result, cached_time = self.cache[cache_key]
-            if datetime.now() - cached_time < self.cache_duration:
-                logger.info(f"Using cached validation result for {cache_key}")
-                return cached_result
+        cache_key = (country_code.upper(), vat_number)
+        cached_result = self._get_cached(cache_key)
+        if cached_result is not None:
+            logger.debug("Using cached validation result for %s%s", *cache_key)
+            return cached_result
         
         # Prepare request data
         request_data = {
@@ -113,7 +134,7 @@ class VIESValidationService:
                 
                 # Cache successful results
                 if result.is_valid is not None:
-                    self.cache[cache_key] = (result, datetime.now())
+                    self._store_cached(cache_key, result)
                 
                 return result
                 